@@ -78,7 +78,7 @@ if [ -n "$FIXTURE_FILE" ] && [ -f "$FIXTURE_FILE" ]; then
 
     if [ "$ROW_COUNT" -eq 0 ]; then
         echo "📥 Table $TABLE_NAME is empty. Loading fixture from $FIXTURE_FILE..."
-        python3 manage.py loaddata "$FIXTURE_FILE"
+        python3 manage.py import_data "$FIXTURE_FILE"
     else
         echo "✅ Table $TABLE_NAME already contains data ($ROW_COUNT rows). Skipping fixture loading."
     fi
@@ -86,13 +86,28 @@ else
     echo "⚠️ Fixture file not found or not defined. Skipping fixture loading."
 fi
 
+# ✅ The search index is kept in sync on save, it is only built when empty
+# unless REBUILD_SEARCH_INDEX=true
+if [ "$(echo "$REBUILD_SEARCH_INDEX" | tr '[:upper:]' '[:lower:]')" = "true" ]; then
+    echo "🔎 Rebuilding the file search index..."
+    python3 manage.py rebuild_search_index
+else
+    echo "🔎 Building the file search index if empty..."
+    python3 manage.py rebuild_search_index --if-empty
+fi
+
 # ✅ Starting the server
 if [ "$(echo "$DEBUG" | tr '[:upper:]' '[:lower:]')" = "false" ]; then
     echo "🧪 Collecting static files..."
     python3 manage.py collectstatic --noinput
 
+    if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+        # Metrics of the previous server run
+        rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+        mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    fi
     echo "🚀 Starting Gunicorn server..."
-    exec gunicorn mousetube_api.asgi:application --bind 0.0.0.0:8000 --timeout 420 -k uvicorn.workers.UvicornWorker
+    exec gunicorn mousetube_api.asgi:application -c python:mousetube_api.gunicorn_conf --bind 0.0.0.0:8000 --timeout 420 -k uvicorn.workers.UvicornWorker
 else
     echo "⚙️ Starting development server..."
     exec python3 manage.py runserver 0.0.0.0:8000
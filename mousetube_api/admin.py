@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.utils.html import format_html
 
 from .models import (
     Dataset,
@@ -6,6 +8,7 @@ from .models import (
     File,
     Protocol,
     Reference,
+    RequestProfile,
     Software,
     Species,
     Strain,
@@ -142,6 +145,61 @@ class SpeciesAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "db_ms",
+        "user",
+    )
+    list_filter = ("view", "method")
+    search_fields = ("path",)
+    fields = (
+        "created_at",
+        "user",
+        "method",
+        "path",
+        "view",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "db_ms",
+        "sql",
+        "folded",
+    )
+    readonly_fields = fields
+    actions = ("download_folded",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="SQL queries")
+    def sql(self, obj):
+        return format_html(
+            "<pre>{}</pre>",
+            "\n".join(
+                f"{query['ms']:>9.3f} ms  {query['sql']}" for query in obj.queries
+            ),
+        )
+
+    @admin.action(description="Download the folded stacks of the selected profiles")
+    def download_folded(self, request, queryset):
+        # Stacks of several profiles are merged, as flame graph tools expect
+        response = HttpResponse(
+            "\n".join(profile.folded for profile in queryset if profile.folded),
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Content-Disposition"] = 'attachment; filename="profiles.folded"'
+        return response
+
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Strain, StrainAdmin)
 admin.site.register(Subject, SubjectAdmin)
@@ -152,3 +210,4 @@ admin.site.register(Software, SoftwareAdmin)
 admin.site.register(Reference, ReferenceAdmin)
 admin.site.register(Dataset, DatasetAdmin)
 admin.site.register(Species, SpeciesAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class MousetubeApiConfig(AppConfig):
+    name = "mousetube_api"
+    verbose_name = "mouseTube API"
+
+    def ready(self):
+        from . import signals
+
+        post_migrate.connect(signals.create_fulltext_indexes, sender=self)
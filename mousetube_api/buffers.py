@@ -0,0 +1,193 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import touch
+from .metrics import BUFFER_FAILURES, BUFFER_FLUSHED, BUFFER_PENDING
+from .models import Dataset, DownloadEvent, File, PageView
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """
+    In-process buffer of counters written to the database in bulk.
+
+    Increments are aggregated in memory per key and handed to ``flush_func``
+    by a background thread every ``interval`` seconds, or as soon as
+    ``max_keys`` distinct keys are pending. Flush functions must add the
+    buffered amounts to the stored values (``F() + n``), so that several
+    worker processes can flush the same keys without losing counts. Pending
+    counts are flushed at interpreter exit, and put back in the buffer when a
+    flush fails.
+
+    Args:
+        flush_func (callable): Called with a ``Counter`` of pending amounts.
+        name (str): Label of the buffer in the metrics.
+        max_keys (int): Number of pending keys that triggers an early flush.
+        interval (float): Maximum time, in seconds, between two flushes.
+    """
+
+    def __init__(self, flush_func, name, max_keys=500, interval=10):
+        self.flush_func = flush_func
+        self.pending = BUFFER_PENDING.labels(buffer=name)
+        self.flushed = BUFFER_FLUSHED.labels(buffer=name)
+        self.failures = BUFFER_FAILURES.labels(buffer=name)
+        self.max_keys = max_keys
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, key, amount=1):
+        with self._lock:
+            self._counts[key] += amount
+            pending = len(self._counts)
+            full = pending >= self.max_keys
+            if self._thread is None:
+                self._start()
+        self.pending.set(pending)
+        if full:
+            self._wake.set()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def flush(self):
+        """
+        Write the pending counts now.
+
+        Returns:
+            int: The number of keys written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, Counter()
+            if not counts:
+                return 0
+            try:
+                self.flush_func(counts)
+            except Exception:
+                logger.exception("Failed to flush %d buffered counters", len(counts))
+                self.failures.inc()
+                with self._lock:
+                    self._counts.update(counts)
+                return 0
+            finally:
+                self.pending.set(len(self._counts))
+            self.flushed.inc(len(counts))
+            return len(counts)
+
+    def _start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="counter-buffer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            # Connections are per thread and would otherwise stay open
+            connections.close_all()
+
+
+def flush_page_views(counts):
+    """
+    Add buffered page views to the ``PageView`` rows, one upsert per key.
+
+    Args:
+        counts (Counter): Number of views keyed by ``(path, date)``.
+    """
+    with transaction.atomic():
+        for (path, date), count in counts.items():
+            views = PageView.objects.filter(path=path, date=date)
+            if views.update(count=F("count") + count):
+                continue
+            try:
+                with transaction.atomic():
+                    PageView.objects.create(path=path, date=date, count=count)
+            except IntegrityError:
+                # Another worker created the row in the meantime
+                views.update(count=F("count") + count)
+
+
+page_views = CounterBuffer(
+    flush_page_views,
+    "page_views",
+    max_keys=getattr(settings, "PAGE_VIEW_BUFFER_SIZE", 500),
+    interval=getattr(settings, "PAGE_VIEW_FLUSH_INTERVAL", 10),
+)
+
+
+def flush_file_downloads(counts):
+    """
+    Add buffered downloads to the ``File`` counters and record them as
+    ``DownloadEvent`` rows.
+
+    Files downloaded the same number of times are updated together, so a
+    flush usually costs a handful of ``UPDATE ... WHERE id IN (...)``
+    statements, plus one bulk insert of events. Unknown files are ignored.
+
+    ``update()`` does not send the signals invalidating API caches, so the
+    flush touches ``File`` and ``Dataset`` (whose responses aggregate file
+    downloads) itself: cached responses and ETags rendering the counters
+    change at most once per flush interval.
+
+    Args:
+        counts (Counter): Number of downloads keyed by ``(file id, date)``.
+    """
+    existing = set(
+        File.objects.filter(pk__in={pk for pk, date in counts}).values_list(
+            "pk", flat=True
+        )
+    )
+    totals = Counter()
+    for (pk, date), count in counts.items():
+        if pk in existing:
+            totals[pk] += count
+
+    files_by_count = defaultdict(list)
+    for pk, count in totals.items():
+        files_by_count[count].append(pk)
+    with transaction.atomic():
+        for count, pks in files_by_count.items():
+            File.objects.filter(pk__in=pks).update(downloads=F("downloads") + count)
+        DownloadEvent.objects.bulk_create(
+            DownloadEvent(file_id=pk, date=date, count=count)
+            for (pk, date), count in counts.items()
+            if pk in existing
+        )
+    if totals:
+        touch(File)
+        touch(Dataset)
+
+
+file_downloads = CounterBuffer(
+    flush_file_downloads,
+    "downloads",
+    max_keys=getattr(settings, "DOWNLOAD_BUFFER_SIZE", 500),
+    interval=getattr(settings, "DOWNLOAD_FLUSH_INTERVAL", 10),
+)
+
+
+def count_download(pk, count=1):
+    """
+    Count downloads of a file today, written by the next flush.
+    """
+    file_downloads.add((pk, timezone.now().date()), count)
@@ -0,0 +1,212 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .metrics import CACHE_HITS, CACHE_MISSES
+from .models import ModelChange
+from .profiling import PROFILE_PARAM
+from .querysets import serializer_models
+
+CACHE_TIMEOUT = getattr(settings, "API_CACHE_TIMEOUT", 60 * 60)
+
+# Query parameters that still describe an unfiltered first page.
+FIRST_PAGE_PARAMS = {"page", "page_size", "fields", "expand"}
+
+
+def touch(model):
+    """
+    Record a change of a model.
+
+    Increments its ``ModelChange`` counter in the database. Cached responses
+    and validators are keyed on those counters, so every process, including
+    the one running a management command, sees the change at once.
+
+    Args:
+        model (type): The model that changed.
+    """
+    label = model._meta.label_lower
+    updated = ModelChange.objects.filter(model=label).update(
+        version=F("version") + 1, modified_at=timezone.now()
+    )
+    if not updated:
+        ModelChange.objects.get_or_create(model=label, defaults={"version": 1})
+
+
+def view_models(view):
+    """
+    Return the models rendered by an API view.
+
+    ``view.cache_models`` when set, otherwise the models of the view's
+    serializer tree.
+    """
+    return getattr(view, "cache_models", None) or serializer_models(
+        view.serializer_class
+    )
+
+
+def model_changes(models):
+    """
+    Return the change counters of some models, in a single query.
+
+    Models that never changed have no ``ModelChange`` row yet and get version
+    0; ``touch`` creates the row, so GET requests never write.
+
+    Args:
+        models (iterable): Model classes.
+
+    Returns:
+        list: ``(label, version, modified_at)`` tuples sorted by label,
+            ``modified_at`` being None for models that never changed.
+    """
+    labels = sorted({model._meta.label_lower for model in models})
+    found = {
+        label: (version, modified_at)
+        for label, version, modified_at in ModelChange.objects.filter(
+            model__in=labels
+        ).values_list("model", "version", "modified_at")
+    }
+    return [(label, *found.get(label, (0, None))) for label in labels]
+
+
+def view_changes(view):
+    """
+    Return the ``model_changes`` of the models of a view, read once per
+    request: the cache key and the validators derive from the same versions.
+    """
+    changes = getattr(view, "_model_changes", None)
+    if changes is None:
+        changes = view._model_changes = model_changes(view_models(view))
+    return changes
+
+
+def cache_url(request):
+    """
+    Return the URL of a request without the ``_profile`` flag, which does not
+    change the response.
+    """
+    if PROFILE_PARAM not in request.query_params:
+        return request.build_absolute_uri()
+    params = request.query_params.copy()
+    del params[PROFILE_PARAM]
+    query = params.urlencode()
+    return request.build_absolute_uri(request.path + (f"?{query}" if query else ""))
+
+
+def is_profiled(request):
+    # Profiled requests do the full work, see profiling.ProfilingMiddleware
+    return getattr(request, "profiled", False)
+
+
+def response_cache_key(request, changes):
+    versions = [(label, version) for label, version, _ in changes]
+    fingerprint = f"{cache_url(request)}|{versions}"
+    return f"api-response-{hashlib.sha256(fingerprint.encode()).hexdigest()}"
+
+
+def cache_response(first_page_only=False):
+    """
+    Cache the data of a read-only API view in the Django cache.
+
+    Entries are keyed by URL and by the ``ModelChange`` versions of the models
+    the view renders: ``view.cache_models`` when set, otherwise the models of
+    ``view.serializer_class``. Saving or deleting any of those rows bumps a
+    version (see ``mousetube_api.signals``), so stale entries are never
+    read again, whichever process made the change and whichever cache
+    backend is used. A hit costs the query reading those versions, shared
+    with ``conditional_response``, but no view query and no serializer work.
+
+    Bulk ``update()`` and ``bulk_update()`` calls do not send signals: code
+    using them must call ``touch`` once done (see ``flush_file_downloads``).
+
+    Args:
+        first_page_only (bool): Only cache unfiltered first pages of a
+            paginated listing; searches, filters and deeper pages are served
+            directly.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, *args, **kwargs):
+            request = view.request
+            if (
+                request.method != "GET"
+                or is_profiled(request)
+                or (first_page_only and not is_first_page(request))
+            ):
+                return method(view, *args, **kwargs)
+
+            key = response_cache_key(request, view_changes(view))
+            data = cache.get(key)
+            if data is not None:
+                CACHE_HITS.inc()
+                return Response(data)
+            CACHE_MISSES.inc()
+
+            response = method(view, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set(key, response.data, CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def is_first_page(request):
+    params = request.query_params
+    return set(params) - {PROFILE_PARAM} <= FIRST_PAGE_PARAMS and params.get(
+        "page", "1"
+    ) in ("", "1")
+
+
+def conditional_response(method):
+    """
+    Add ETag and Last-Modified validators to a read-only API view.
+
+    The validators are derived from the ``ModelChange`` counters of the
+    models the view renders, in a single small query, rather than from the
+    response body. ``cache_response`` keys its entries on the same versions,
+    read once, so a cached body always matches its ETag. Requests whose
+    ``If-None-Match`` or ``If-Modified-Since`` still match get a 304 before
+    the view, the cache or the serializers run.
+    """
+
+    @wraps(method)
+    def wrapper(view, *args, **kwargs):
+        request = view.request
+        if request.method not in ("GET", "HEAD") or is_profiled(request):
+            return method(view, *args, **kwargs)
+
+        changes = view_changes(view)
+        versions = [(label, version) for label, version, _ in changes]
+        fingerprint = f"{cache_url(request)}|{request.accepted_media_type}|{versions}"
+        etag = quote_etag(hashlib.sha256(fingerprint.encode()).hexdigest())
+        modified = [modified_at for _, _, modified_at in changes if modified_at]
+        last_modified = int(max(modified).timestamp()) if modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            return response
+
+        response = method(view, *args, **kwargs)
+        if response.status_code == 200:
+            response.headers.setdefault("ETag", etag)
+            if last_modified is not None:
+                response.headers.setdefault("Last-Modified", http_date(last_modified))
+        return response
+
+    return wrapper
@@ -0,0 +1,61 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Dataset, File, FileDownload, Species
+
+# Model of each series scope, and the FileDownload rows of one of its rows.
+DOWNLOAD_SCOPES = {
+    "file": (File, lambda pk: {"file_id": pk}),
+    "dataset": (
+        Dataset,
+        lambda pk: {
+            "file_id__in": Dataset.files.through.objects.filter(dataset_id=pk).values(
+                "file_id"
+            )
+        },
+    ),
+    "species": (Species, lambda pk: {"species_id": pk}),
+}
+
+DOWNLOAD_PERIODS = {
+    "day": F("date"),
+    "month": TruncMonth("date"),
+}
+
+
+def download_series(scope, pk, period="day", start=None, end=None):
+    """
+    Return the downloads of a file, dataset or species over time.
+
+    Reads the daily ``FileDownload`` counts with a range scan of the
+    ``(file, date)`` or ``(species, date)`` index, grouped by day or month.
+
+    Args:
+        scope (str): One of ``DOWNLOAD_SCOPES``.
+        pk (int): The id of the file, dataset or species.
+        period (str): ``"day"`` or ``"month"``.
+        start (date, optional): First day of the series.
+        end (date, optional): Last day of the series.
+
+    Returns:
+        list: ``{"date", "count"}`` items in chronological order, only for
+            periods with downloads.
+    """
+    _, lookups = DOWNLOAD_SCOPES[scope]
+    rows = FileDownload.objects.filter(**lookups(pk))
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+    rows = (
+        rows.annotate(period=DOWNLOAD_PERIODS[period])
+        .values("period")
+        .annotate(total=Sum("count"))
+        .order_by("period")
+    )
+    return [{"date": row["period"], "count": row["total"]} for row in rows]
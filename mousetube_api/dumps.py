@@ -0,0 +1,113 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import gzip
+import json
+
+from django.core.management.base import CommandError
+
+from .models import (
+    Dataset,
+    Experiment,
+    File,
+    Protocol,
+    Reference,
+    Software,
+    Species,
+    Strain,
+    Subject,
+    User,
+)
+
+# Models of a catalog dump, each one after the models it references.
+CATALOG_MODELS = [
+    User,
+    Species,
+    Strain,
+    Subject,
+    Protocol,
+    Experiment,
+    File,
+    Reference,
+    Software,
+    Dataset,
+]
+
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+
+READ_SIZE = 1 << 16
+
+
+def guess_compression(path):
+    """
+    Return the compression of a dump from its extension.
+    """
+    for suffix, compression in COMPRESSIONS.items():
+        if path.endswith(suffix):
+            return compression
+    return "none"
+
+
+def open_dump(path, mode, compression=None):
+    """
+    Open a dump file in text mode, compressed or not.
+
+    Args:
+        path (str): Path of the dump.
+        mode (str): ``"r"`` or ``"w"``.
+        compression (str, optional): ``"none"``, ``"gzip"`` or ``"zstd"``.
+            Guessed from the extension when omitted.
+    """
+    compression = compression or guess_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError(
+                "zstd compression requires the 'zstandard' package"
+            ) from None
+        return zstandard.open(path, f"{mode}t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def iter_records(stream):
+    """
+    Read the records of a JSON array fixture one at a time.
+
+    Only one record, plus a read buffer, is held in memory, however large
+    the array is.
+
+    Args:
+        stream: A text file positioned at the start of the array.
+
+    Yields:
+        dict: The fixture records.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n[],":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                return
+            buffer, pos = stream.read(READ_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The record continues in the next block
+            chunk = stream.read(READ_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
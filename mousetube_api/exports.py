@@ -0,0 +1,208 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import csv
+import io
+
+from .models import File
+from .renderers import dumps
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Columns of the flattened File export, and their lookup from File.
+FILE_EXPORT_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "number": "number",
+    "link": "link",
+    "notes": "notes",
+    "doi": "doi",
+    "is_valid_link": "is_valid_link",
+    "downloads": "downloads",
+    "spectrogram": "spectrogram",
+    "plot": "plot",
+    "experiment_id": "experiment_id",
+    "experiment_name": "experiment__name",
+    "experiment_date": "experiment__date",
+    "laboratory": "experiment__laboratory",
+    "group_subject": "experiment__group_subject",
+    "temperature": "experiment__temperature",
+    "light_cycle": "experiment__light_cycle",
+    "microphone": "experiment__microphone",
+    "acquisition_hardware": "experiment__acquisition_hardware",
+    "acquisition_software": "experiment__acquisition_software",
+    "sampling_rate": "experiment__sampling_rate",
+    "bit_depth": "experiment__bit_depth",
+    "protocol_id": "experiment__protocol_id",
+    "protocol_name": "experiment__protocol__name",
+    "subject_id": "subject_id",
+    "subject_name": "subject__name",
+    "sex": "subject__sex",
+    "genotype": "subject__genotype",
+    "treatment": "subject__treatment",
+    "subject_group": "subject__group",
+    "origin": "subject__origin",
+    "strain_id": "subject__strain_id",
+    "strain_name": "subject__strain__name",
+    "strain_background": "subject__strain__background",
+    "species_id": "species_id",
+    "species_name": "species__name",
+}
+
+# Media type and file extension of each output.
+EXPORT_OUTPUTS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def iter_file_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Read the flattened export rows of a File queryset, chunk by chunk.
+
+    Each chunk is one ``values_list()`` query joining the file with its
+    experiment, protocol, subject, strain and species, starting after the
+    last primary key of the previous chunk, so memory stays bounded and deep
+    chunks cost the same as the first one.
+
+    Yields:
+        list: Tuples in ``FILE_EXPORT_COLUMNS`` order.
+    """
+    queryset = queryset.order_by("pk").values_list(*FILE_EXPORT_COLUMNS.values())
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        if rows:
+            yield rows
+            last_pk = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def ndjson_export(chunks):
+    names = list(FILE_EXPORT_COLUMNS)
+    for rows in chunks:
+        yield b"".join(
+            dumps(dict(zip(names, row, strict=True))) + b"\n" for row in rows
+        )
+
+
+def csv_export(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FILE_EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only stream whose content is taken out piece by piece."""
+
+    def __init__(self):
+        self.pieces = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.pieces.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data, self.pieces = b"".join(self.pieces), []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        "AutoField": pa.int64(),
+        "BigAutoField": pa.int64(),
+        "IntegerField": pa.int64(),
+        "FloatField": pa.float64(),
+        "BooleanField": pa.bool_(),
+        "DateField": pa.date32(),
+    }
+    fields = []
+    for name, lookup in FILE_EXPORT_COLUMNS.items():
+        model, *path = File, *lookup.split("__")
+        for part in path[:-1]:
+            model = model._meta.get_field(part).related_model
+        field = model._meta.get_field(path[-1])
+        if field.is_relation:
+            field = field.target_field
+        fields.append(pa.field(name, types.get(field.get_internal_type(), pa.string())))
+    return pa.schema(fields)
+
+
+def parquet_export(chunks):
+    """
+    Write each chunk as a Parquet row group.
+
+    Each row group is yielded as soon as it is written, so memory stays
+    bounded by one chunk, but the file is only readable once the footer,
+    yielded last, has arrived: clients get a streamed download, not
+    incremental rows as with NDJSON or CSV.
+
+    Requires the optional ``pyarrow`` package.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in chunks:
+            columns = zip(*rows, strict=True)
+            arrays = [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, schema, strict=True)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+EXPORT_WRITERS = {
+    "ndjson": ndjson_export,
+    "csv": csv_export,
+    "parquet": parquet_export,
+}
+
+
+def export_files(queryset, output, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Export the files of a queryset in one of ``EXPORT_OUTPUTS``.
+
+    Args:
+        queryset (QuerySet): The (filtered) File queryset.
+        output (str): ``"ndjson"``, ``"csv"`` or ``"parquet"``.
+        chunk_size (int): Number of rows read per query.
+
+    Returns:
+        generator: The export, as pieces of bytes.
+    """
+    return EXPORT_WRITERS[output](iter_file_rows(queryset, chunk_size))
@@ -0,0 +1,114 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+from collections import Counter, defaultdict
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Dataset
+
+# Facets of a dataset summary, and their lookup from a dataset/file row.
+DATASET_FACETS = {
+    "species": "file__species__name",
+    "strains": "file__subject__strain__name",
+    "laboratories": "file__experiment__laboratory",
+}
+
+
+def annotate_dataset_summaries(queryset):
+    """
+    Annotate a Dataset queryset with the size of each dataset.
+
+    Adds ``file_count`` and ``total_downloads``, computed by the listing
+    query itself with a single join on the dataset files.
+    """
+    return queryset.annotate(
+        file_count=Count("files"),
+        total_downloads=Coalesce(Sum("files__downloads"), 0),
+    )
+
+
+def attach_dataset_facets(datasets):
+    """
+    Set the ``facets`` attribute of some datasets.
+
+    The species, strains and laboratories of the files of every dataset are
+    counted in one grouped query, whatever the number of datasets.
+
+    Args:
+        datasets (list): Dataset instances, typically one page of results.
+
+    Returns:
+        list: The same datasets. ``facets`` maps each facet of
+            ``DATASET_FACETS`` to ``{"name", "count"}`` items, most frequent
+            first.
+    """
+    counts = defaultdict(lambda: {facet: Counter() for facet in DATASET_FACETS})
+    rows = (
+        Dataset.files.through.objects.filter(
+            dataset_id__in=[dataset.pk for dataset in datasets]
+        )
+        .values_list("dataset_id", *DATASET_FACETS.values())
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+    for dataset_id, *values, count in rows:
+        for facet, value in zip(DATASET_FACETS, values, strict=True):
+            if value not in (None, ""):
+                counts[dataset_id][facet][value] += count
+
+    for dataset in datasets:
+        dataset.facets = {
+            facet: [
+                {"name": name, "count": count}
+                for name, count in sorted(values.items(), key=lambda x: (-x[1], x[0]))
+            ]
+            for facet, values in counts[dataset.pk].items()
+        }
+    return datasets
+
+
+# Facets of the file listing: the grouped column, and the column labelling
+# its values when they are foreign keys.
+FILE_FACETS = {
+    "species": ("species_id", "species__name"),
+    "strain": ("subject__strain_id", "subject__strain__name"),
+    "sex": ("subject__sex", None),
+    "genotype": ("subject__genotype", None),
+    "laboratory": ("experiment__laboratory", None),
+    "sampling_rate": ("experiment__sampling_rate", None),
+    "is_valid_link": ("is_valid_link", None),
+}
+
+
+def file_facets(queryset):
+    """
+    Count the files of a queryset per value of each facet.
+
+    Runs one ``GROUP BY`` query per facet of ``FILE_FACETS``, plus the total.
+
+    Args:
+        queryset (QuerySet): A filtered File queryset.
+
+    Returns:
+        dict: ``count``, the number of files, and ``facets``, mapping each
+            facet to ``{"value", "label", "count"}`` items, most frequent
+            first. ``label`` is only set for foreign keys.
+    """
+    queryset = queryset.order_by()
+    facets = {}
+    for facet, (column, label) in FILE_FACETS.items():
+        columns = [column, label] if label else [column]
+        rows = queryset.values_list(*columns).annotate(count=Count("pk")).order_by()
+        items = [
+            {"value": row[0], "label": row[1], "count": row[-1]}
+            if label
+            else {"value": row[0], "count": row[-1]}
+            for row in rows
+        ]
+        items.sort(key=lambda item: (-item["count"], str(item["value"])))
+        facets[facet] = items
+    return {"count": queryset.count(), "facets": facets}
@@ -0,0 +1,133 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils.timezone import make_aware
+
+from .search import DATASET_SEARCH_FIELDS, search_datasets, search_files
+from .serializers import DatasetFilterSerializer, FileFilterSerializer
+
+ALLOWED_FILE_FILTERS = ["is_valid_link"]
+
+# Lookup of each typed file filter, all on indexed columns or foreign keys.
+FILE_FILTER_LOOKUPS = {
+    "species": "species_id",
+    "strain": "subject__strain_id",
+    "protocol": "experiment__protocol_id",
+    "sex": "subject__sex",
+    "laboratory": "experiment__laboratory",
+    "date_after": "experiment__date__gte",
+    "date_before": "experiment__date__lte",
+    "sampling_rate_min": "experiment__sampling_rate__gte",
+    "sampling_rate_max": "experiment__sampling_rate__lte",
+}
+
+
+def filter_files(queryset, params):
+    """
+    Apply the ``search``, ``filter`` and typed filter parameters of a File
+    listing.
+
+    Shared by the file list and its facets, so that both always describe the
+    same set of files. Typed filters (see ``FileFilterSerializer``) become
+    equality or range predicates on indexed columns and never go through
+    the text search.
+
+    Args:
+        queryset (QuerySet): The File queryset to narrow.
+        params (QueryDict): The request query parameters.
+
+    Returns:
+        QuerySet: The filtered queryset, ordered by relevance when a ranked
+            search was applied.
+
+    Raises:
+        ValidationError: If a typed filter has an invalid value.
+    """
+    search_query = params.get("search", "")
+    filter_query = params.get("filter", "")
+
+    if search_query:
+        queryset = search_files(queryset, search_query)
+
+    # Apply filters
+    if filter_query:
+        for filter_name in filter_query.split(","):
+            if filter_name not in ALLOWED_FILE_FILTERS:
+                continue  # Ignore invalid filters
+
+            if filter_name == "is_valid_link":
+                queryset = queryset.filter(is_valid_link=True)
+
+    typed_filters = FileFilterSerializer(data=params)
+    typed_filters.is_valid(raise_exception=True)
+    values = typed_filters.validated_data
+    lookups = {
+        lookup: values[name]
+        for name, lookup in FILE_FILTER_LOOKUPS.items()
+        if name in values
+    }
+    if lookups:
+        queryset = queryset.filter(**lookups)
+
+    has_spectrogram = values.get("has_spectrogram")
+    if has_spectrogram is not None:
+        # Empty names are stored for cleared images
+        with_spectrogram = Q(spectrogram__gt="")
+        queryset = queryset.filter(
+            with_spectrogram if has_spectrogram else ~with_spectrogram
+        )
+
+    return queryset
+
+
+def start_of_day(day):
+    # Compare the indexed column with a datetime rather than its date part
+    return make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def filter_datasets(queryset, params):
+    """
+    Apply the ``search``, ``filter`` and typed filter parameters of a
+    Dataset listing.
+
+    ``filter`` restricts the text search to one of ``DATASET_SEARCH_FIELDS``.
+    Typed filters (see ``DatasetFilterSerializer``) become predicates on the
+    indexed species and creation date columns.
+
+    Args:
+        queryset (QuerySet): The Dataset queryset to narrow.
+        params (QueryDict): The request query parameters.
+
+    Returns:
+        QuerySet: The filtered queryset.
+
+    Raises:
+        ValidationError: If a typed filter has an invalid value.
+    """
+    search_query = params.get("search", "")
+    filter_query = params.get("filter", "")
+
+    if search_query:
+        field = filter_query if filter_query in DATASET_SEARCH_FIELDS else None
+        queryset = search_datasets(queryset, search_query, field)
+
+    typed_filters = DatasetFilterSerializer(data=params)
+    typed_filters.is_valid(raise_exception=True)
+    values = typed_filters.validated_data
+    if "species" in values:
+        queryset = queryset.filter(species_id=values["species"])
+    if "created_after" in values:
+        queryset = queryset.filter(
+            created_at__gte=start_of_day(values["created_after"])
+        )
+    if "created_before" in values:
+        queryset = queryset.filter(
+            created_at__lt=start_of_day(values["created_before"] + timedelta(days=1))
+        )
+
+    return queryset
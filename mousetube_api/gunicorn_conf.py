@@ -0,0 +1,16 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+# Gunicorn settings, used with "-c python:mousetube_api.gunicorn_conf"
+
+import os
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of the worker from the shared metrics directory
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,216 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = getattr(settings, "SLOW_REQUEST_MS", 1000)
+SLOW_REQUEST_QUERIES = getattr(settings, "SLOW_REQUEST_QUERIES", 50)
+
+# Upper bounds of the histogram buckets, in milliseconds (or queries).
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Timings of the request being handled, None when instrumentation is off.
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Query count and durations, in seconds, of the phases of one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = {"db": 0.0, "serialize": 0.0, "render": 0.0}
+        self._running = set()
+
+    def execute(self, execute, sql, params, many, context):
+        # Database execute wrapper, see connection.execute_wrapper()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations["db"] += time.perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to a phase of the current request.
+
+    Does nothing when instrumentation is off, and when the block is nested in
+    another block of the same phase (e.g. nested serializers).
+    """
+    timings = _current.get()
+    if timings is None or phase in timings._running:
+        yield
+        return
+    timings._running.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[phase] += time.perf_counter() - start
+        timings._running.discard(phase)
+
+
+class Histogram:
+    """
+    Number of observed values in each bucket, not cumulative.
+
+    Args:
+        buckets (tuple): Sorted upper bounds; larger values go to a last,
+            unbounded bucket.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def _observe(view, timings, total):
+    values = {
+        "total_ms": total * 1000,
+        "db_ms": timings.durations["db"] * 1000,
+        "serialize_ms": timings.durations["serialize"] * 1000,
+        "render_ms": timings.durations["render"] * 1000,
+        "queries": timings.queries,
+    }
+    with _histograms_lock:
+        histograms = _histograms.get(view)
+        if histograms is None:
+            histograms = _histograms[view] = {
+                name: Histogram(
+                    QUERY_BUCKETS if name == "queries" else DURATION_BUCKETS
+                )
+                for name in values
+            }
+        for name, value in values.items():
+            histograms[name].observe(value)
+
+
+def request_histograms():
+    """
+    Return the histograms of the requests handled by this process.
+
+    Returns:
+        dict: Keyed by URL name, then by measure (``total_ms``, ``db_ms``,
+            ``serialize_ms``, ``render_ms`` and ``queries``), the
+            ``{"buckets", "counts", "sum", "count"}`` of each histogram.
+    """
+    with _histograms_lock:
+        return {
+            view: {name: histogram.snapshot() for name, histogram in measures.items()}
+            for view, measures in _histograms.items()
+        }
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or match.route
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Measure the SQL queries, database, serializer and render time of every
+    request.
+
+    The measures are sent in a ``Server-Timing`` header, added to in-process
+    histograms per URL name (see ``request_histograms``, served at
+    ``/metrics/requests``), and requests above
+    ``SLOW_REQUEST_MS`` or ``SLOW_REQUEST_QUERIES`` are logged. The body of
+    streaming responses is produced after the response leaves the middleware
+    and is not measured.
+
+    Enabled by the ``REQUEST_INSTRUMENTATION`` setting; otherwise Django drops
+    the middleware at startup and ``timed`` blocks cost a context variable
+    lookup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        view = view_name(request)
+        _observe(view, timings, total)
+        response["Server-Timing"] = server_timing(timings, total)
+
+        total_ms = total * 1000
+        if total_ms >= SLOW_REQUEST_MS or timings.queries >= SLOW_REQUEST_QUERIES:
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries, db %.0f ms, "
+                "serialize %.0f ms, render %.0f ms",
+                request.method,
+                request.get_full_path(),
+                view,
+                total_ms,
+                timings.queries,
+                timings.durations["db"] * 1000,
+                timings.durations["serialize"] * 1000,
+                timings.durations["render"] * 1000,
+            )
+        return response
+
+
+def server_timing(timings, total):
+    """
+    Format the ``Server-Timing`` header of a request, durations in ms.
+    """
+    durations = timings.durations
+    return ", ".join(
+        [
+            f'db;dur={durations["db"] * 1000:.1f};desc="{timings.queries} queries"',
+            f"serialize;dur={durations['serialize'] * 1000:.1f}",
+            f"render;dur={durations['render'] * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ]
+    )
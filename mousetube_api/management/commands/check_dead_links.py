@@ -1,16 +1,55 @@
 import logging
 import os
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
 from urllib.parse import unquote, urlparse
 
 import requests
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
 
-from mousetube_api.models import File
+from mousetube_api.caching import touch
+from mousetube_api.metrics import DEAD_LINK_CHECKS, DEAD_LINK_RUN, job_finished
+from mousetube_api.models import File, LinkCheck
 
 logger = logging.getLogger("check_dead_links")
 
 
+class HostRateLimiter:
+    """
+    Space out the requests sent to each host.
+
+    Requests to the same host are at least ``delay`` seconds apart, while
+    requests to different hosts are not delayed by each other.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, host, seconds):
+        """Hold back every request to ``host`` for ``seconds``."""
+        with self._lock:
+            resume = time.monotonic() + seconds
+            self._next_slot[host] = max(self._next_slot.get(host, resume), resume)
+
+
 class Command(BaseCommand):
     help = "Check for dead links in mousetube files"
 
@@ -21,80 +60,293 @@ class Command(BaseCommand):
             action="store_true",
             help="Retrieve the name of the file from the downloaded file",
         )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of links checked in parallel (default: 1)",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=1.0,
+            help="Minimum delay in seconds between two requests to the same host",
+        )
+        parser.add_argument(
+            "--max_retries",
+            type=int,
+            default=3,
+            help="Number of retries of a link answering 429 Too Many Requests",
+        )
+        parser.add_argument(
+            "--recheck_after",
+            type=float,
+            default=0,
+            help="Skip valid links checked less than this many hours ago (default: 0, check all links)",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=500,
+            help="Number of checked files written to the database at once",
+        )
 
     def handle(self, *args, **options):
         logger.info("Starting dead link check...")
+        started = time.time()
+        self.run_counts = Counter()
+        for result in ("queued", "checked", "ok", "broken", "rate_limited"):
+            DEAD_LINK_RUN.labels(result=result).set(0)
 
         fill_name_mode = options["fill_name"]
+        concurrency = max(1, options["concurrency"])
+        self.max_retries = max(0, options["max_retries"])
+        self.limiter = HostRateLimiter(options["delay"])
+        self.sessions = threading.local()
+        self.pool_size = concurrency
+        self.batch_size = max(1, options["batch_size"])
+        self.changed_files = {}
+        self.checks = []
+        self.files_updated = False
+
         files = File.objects.exclude(link__isnull=True).exclude(link="")
+        to_check = files.select_related("link_check").only(
+            "id", "name", "link", "is_valid_link", "link_check"
+        )
+        if options["recheck_after"] > 0:
+            # Valid links checked recently are skipped, failing ones are retried
+            checked_since = timezone.now() - timedelta(hours=options["recheck_after"])
+            to_check = to_check.exclude(
+                is_valid_link=True,
+                link_check__checked_at__gte=checked_since,
+                link_check__status_code__lt=400,
+            )
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {}
+            for file in to_check.iterator():
+                url = file.link
+                parsed = urlparse(url)
 
-        for file in files:
-            url = file.link
-            parsed = urlparse(url)
+                # Check if the URL is valid
+                if not url.startswith(("http://", "https://")):
+                    logger.error(f"Invalid URL format: {url}")
+                    continue
 
-            # Check if the URL is valid
-            if not url.startswith(("http://", "https://")):
-                logger.error(f"Invalid URL format: {url}")
-                continue
+                # Skip local links (localhost, 127.0.0.1)
+                if parsed.hostname in ["localhost", "127.0.0.1"]:
+                    logger.info(f"Skipping local link: {url}")
+                    continue
 
-            # Skip local links (localhost, 127.0.0.1)
-            if parsed.hostname in ["localhost", "127.0.0.1"]:
-                logger.info(f"Skipping local link: {url}")
-                continue
+                futures[
+                    executor.submit(
+                        self.check_link,
+                        url,
+                        parsed.hostname,
+                        self.conditional_headers(file),
+                    )
+                ] = file
 
-            try:
-                # Send a HEAD request to avoid downloading the entire file
-                time.sleep(1)  # Sleep for 1 second to avoid overwhelming the server
+            DEAD_LINK_RUN.labels(result="queued").set(len(futures))
 
+            # Results are handled in this thread, which owns the DB connection
+            for future in as_completed(futures):
+                self.handle_result(futures[future], future.result(), fill_name_mode)
+                if len(self.checks) >= self.batch_size:
+                    self.write_results()
+
+        self.write_results()
+        if self.files_updated:
+            # bulk_update() does not send the signals invalidating API caches
+            touch(File)
+
+        stats = files.aggregate(
+            total=Count("id"), valid=Count("id", filter=Q(is_valid_link=True))
+        )
+        logger.info(f"Total files: {stats['total']}")
+        logger.info(f"Valid files: {stats['valid']}")
+        logger.info(f"Invalid files: {stats['total'] - stats['valid']}")
+        logger.info("Dead link check finished.")
+        job_finished("check_dead_links", started)
+
+    def conditional_headers(self, file):
+        """
+        Build the validators of the previous check of a file, if any.
+        """
+        try:
+            check = file.link_check
+        except LinkCheck.DoesNotExist:
+            return {}
+        if check.status_code is None or check.status_code >= 400:
+            return {}
+        headers = {}
+        if check.etag:
+            headers["If-None-Match"] = check.etag
+        if check.last_modified:
+            headers["If-Modified-Since"] = check.last_modified
+        return headers
+
+    def write_results(self):
+        """
+        Write the pending file changes and check history in bulk.
+        """
+        if not self.checks:
+            return
+        with transaction.atomic():
+            if self.changed_files:
+                File.objects.bulk_update(
+                    self.changed_files.values(), ["is_valid_link", "name"]
+                )
+                self.files_updated = True
+            LinkCheck.objects.bulk_create(
+                self.checks,
+                update_conflicts=True,
+                unique_fields=["file"],
+                update_fields=[
+                    "checked_at",
+                    "status_code",
+                    "etag",
+                    "last_modified",
+                    "error",
+                ],
+            )
+        self.changed_files = {}
+        self.checks = []
+
+    def get_session(self):
+        """
+        Return the HTTP session of the current thread.
+
+        Sessions keep connections alive, so links hosted on the same server
+        reuse the same pooled connections.
+        """
+        session = getattr(self.sessions, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.sessions.session = session
+        return session
+
+    def check_link(self, url, host, headers):
+        """
+        Request a link, retrying with backoff while it answers 429.
+
+        ``headers`` carries the validators of the previous check: a remote
+        file that did not change answers 304 without being sent again.
+
+        Returns:
+            tuple: ``(response, exception)``, one of them being None.
+        """
+        session = self.get_session()
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait(host)
+            try:
                 # Check if the URL is reachable
                 # Use a timeout to avoid hanging indefinitely
                 # Use allow_redirects=True to follow redirects
-                # Try HEAD first
-                response = requests.head(url, allow_redirects=True, timeout=5)
-                if response.status_code >= 400:
+                # Try HEAD first to avoid downloading the entire file
+                response = session.head(
+                    url, headers=headers, allow_redirects=True, timeout=5
+                )
+                if response.status_code >= 400 and response.status_code != 429:
                     # If HEAD fails, try GET
-                    response = requests.get(
+                    response = session.get(
                         url, allow_redirects=True, timeout=10, stream=True
                     )
-                link_alive = response.status_code < 400
-                if response.status_code == 429:
-                    logger.warning(
-                        f"Rate limite reached with status code {response.status_code}: {url}"
-                    )
-                    continue
+                    response.close()
             except requests.RequestException as e:
-                # Log broken links
-                logger.error(f"BROKEN: {url} (Exception: {e})")
-                link_alive = False
-
-            # If the link is alive
-            if link_alive:
-                logger.info(f"OK: {url} {response.status_code}")
-                if not file.is_valid_link:
-                    file.is_valid_link = True
-                    file.save()
-
-                # Fill name if requested
-                if fill_name_mode and not file.name:
-                    filename = self.extract_filename(response, url)
-                    if filename:
-                        logger.info(f"Setting filename: {filename}")
-                        file.name = filename
-                        file.save()
-            else:
-                # If the link is dead
+                return None, e
+
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response, None
+
+            delay = self.retry_after(response) or 2**attempt * self.limiter.delay
+            logger.info(f"Rate limited, retrying in {delay:.0f}s: {url}")
+            self.limiter.defer(host, delay)
+        return response, None
+
+    def retry_after(self, response):
+        """
+        Parse the Retry-After header, in seconds or as an HTTP date.
+        """
+        value = response.headers.get("retry-after")
+        if not value:
+            return None
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def handle_result(self, file, result, fill_name_mode):
+        url = file.link
+        response, error = result
+        self.record_check(file, response, error)
+
+        if error is not None:
+            # Log broken links
+            logger.error(f"BROKEN: {url} (Exception: {error})")
+            link_alive = False
+        else:
+            link_alive = response.status_code < 400
+            if response.status_code == 429:
+                logger.warning(
+                    f"Rate limite reached with status code {response.status_code}: {url}"
+                )
+                self.count_result("rate_limited")
+                return
+        self.count_result("ok" if link_alive else "broken")
+
+        # If the link is alive
+        if link_alive:
+            logger.info(f"OK: {url} {response.status_code}")
+            if not file.is_valid_link:
+                file.is_valid_link = True
+                self.changed_files[file.pk] = file
+
+            # Fill name if requested
+            if fill_name_mode and not file.name:
+                filename = self.extract_filename(response, url)
+                if filename:
+                    logger.info(f"Setting filename: {filename}")
+                    file.name = filename
+                    self.changed_files[file.pk] = file
+        else:
+            # If the link is dead
+            if response is not None:
                 logger.error(f"BROKEN: {url} {response.status_code}")
-                if file.is_valid_link:
-                    file.is_valid_link = False
-                    file.save()
+            if file.is_valid_link:
+                file.is_valid_link = False
+                self.changed_files[file.pk] = file
 
-        files = File.objects.exclude(link__isnull=True).exclude(link="")
-        valid_files = files.filter(is_valid_link=True)
-        invalid_files = files.filter(is_valid_link=False)
-        logger.info(f"Total files: {files.count()}")
-        logger.info(f"Valid files: {valid_files.count()}")
-        logger.info(f"Invalid files: {invalid_files.count()}")
-        logger.info("Dead link check finished.")
+    def count_result(self, result):
+        DEAD_LINK_CHECKS.labels(result=result).inc()
+        # The run gauges keep the last value written by any process
+        self.run_counts.update([result, "checked"])
+        for name in (result, "checked"):
+            DEAD_LINK_RUN.labels(result=name).set(self.run_counts[name])
+
+    def record_check(self, file, response, error):
+        check = LinkCheck(file_id=file.pk, checked_at=timezone.now())
+        if error is not None:
+            check.error = str(error)
+        else:
+            check.status_code = response.status_code
+            previous = self.conditional_headers(file)
+            if response.status_code == 304:
+                # Not modified: the remote file keeps its validators
+                check.etag = previous.get("If-None-Match", "")
+                check.last_modified = previous.get("If-Modified-Since", "")
+            else:
+                check.etag = response.headers.get("etag", "")[:255]
+                check.last_modified = response.headers.get("last-modified", "")[:64]
+        self.checks.append(check)
 
     def extract_filename(self, response, url):
         """
@@ -1,50 +1,76 @@
 import json
+from itertools import islice
 
 from django.core.management.base import BaseCommand
-from django.core.serializers import serialize
+from django.core.serializers import get_serializer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
 
-from mousetube_api.models import Experiment, File, Protocol, Strain, Subject, User
+from mousetube_api.dumps import CATALOG_MODELS, guess_compression, open_dump
+
+
+def export_queryset(model):
+    """
+    Return the rows of a model in primary key order, with the primary keys
+    of their many-to-many relations prefetched chunk by chunk.
+    """
+    queryset = model._default_manager.order_by("pk")
+    for field in model._meta.many_to_many:
+        queryset = queryset.prefetch_related(
+            Prefetch(field.name, queryset=field.related_model.objects.only("pk"))
+        )
+    return queryset
 
 
 class Command(BaseCommand):
-    help = "Export data from User, Strain, Subject, Protocol, Experiment, and File models to a JSON fixture file"
-
-    def handle(self, *args, **kwargs):
-        users = User.objects.all()
-        strains = Strain.objects.all()
-        subjects = Subject.objects.select_related("strain").all()
-        protocols = Protocol.objects.all()
-        experiments = Experiment.objects.select_related("protocol").all()
-        files = File.objects.select_related("experiment", "subject").all()
-
-        users_json = serialize("json", users)
-        strains_json = serialize("json", strains)
-        subjects_json = serialize("json", subjects)
-        protocols_json = serialize("json", protocols)
-        experiments_json = serialize("json", experiments)
-        files_json = serialize("json", files)
-
-        data = {
-            "users": json.loads(users_json),
-            "strains": json.loads(strains_json),
-            "subjects": json.loads(subjects_json),
-            "protocols": json.loads(protocols_json),
-            "experiments": json.loads(experiments_json),
-            "files": json.loads(files_json),
-        }
-
-        with open("exported_data.json", "w") as f:
-            json.dump(
-                data["users"]
-                + data["strains"]
-                + data["subjects"]
-                + data["protocols"]
-                + data["experiments"]
-                + data["files"],
-                f,
-                indent=4,
-            )
+    help = "Export the mouseTube catalog to a JSON fixture file, streaming each model in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="exported_data.json",
+            help="Path of the fixture file (default: exported_data.json)",
+        )
+        parser.add_argument(
+            "--compress",
+            choices=["none", "gzip", "zstd"],
+            help="Compress the output (default: guessed from a .gz or .zst extension)",
+        )
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=2000,
+            help="Number of rows fetched and serialized at once",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        compression = options["compress"] or guess_compression(path)
+        chunk_size = max(1, options["chunk_size"])
+        serializer = get_serializer("python")()
+
+        # The file stays a JSON array that loaddata accepts, with one record
+        # per line so that it can also be read back as a stream.
+        total = 0
+        with open_dump(path, "w", compression) as f:
+            f.write("[")
+            for model in CATALOG_MODELS:
+                rows = export_queryset(model).iterator(chunk_size=chunk_size)
+                count = 0
+                while chunk := list(islice(rows, chunk_size)):
+                    for record in serializer.serialize(chunk):
+                        f.write(",\n" if total else "\n")
+                        f.write(
+                            json.dumps(
+                                record, cls=DjangoJSONEncoder, ensure_ascii=False
+                            )
+                        )
+                        total += 1
+                    count += len(chunk)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{model._meta.label}: {count} rows")
+            f.write("\n]\n")
 
         self.stdout.write(
-            self.style.SUCCESS("Data exported successfully to 'exported_data.json'.")
+            self.style.SUCCESS(f"{total} records exported successfully to '{path}'.")
         )
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from rest_framework.exceptions import ValidationError
+
+from mousetube_api.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_OUTPUTS,
+    export_files,
+    parquet_available,
+)
+from mousetube_api.filters import filter_files
+from mousetube_api.models import File
+
+
+class Command(BaseCommand):
+    help = "Export the flattened File catalog as NDJSON, CSV or Parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="mousetube_files.ndjson",
+            help="Path of the export file (default: mousetube_files.ndjson)",
+        )
+        parser.add_argument(
+            "--format",
+            choices=list(EXPORT_OUTPUTS),
+            help="Export format (default: guessed from the output extension)",
+        )
+        parser.add_argument("--search", help="Text search, as on /api/file/")
+        parser.add_argument("--filter", help="Filters, as on /api/file/")
+        parser.add_argument(
+            "--where",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Typed filter of /api/file/, e.g. --where species=1 (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Number of rows read per query",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        output = options["format"] or path.rsplit(".", 1)[-1]
+        if output not in EXPORT_OUTPUTS:
+            raise CommandError(f"Unknown export format: {output}")
+        if output == "parquet" and not parquet_available():
+            raise CommandError("Parquet export requires the 'pyarrow' package")
+
+        params = QueryDict(mutable=True)
+        for name in ("search", "filter"):
+            if options[name]:
+                params[name] = options[name]
+        for condition in options["where"]:
+            name, sep, value = condition.partition("=")
+            if not sep:
+                raise CommandError(f"Invalid filter, use NAME=VALUE: {condition}")
+            params[name] = value
+
+        try:
+            files = filter_files(File.objects.all(), params)
+        except ValidationError as e:
+            raise CommandError(f"Invalid filter: {e.detail}") from e
+
+        with open(path, "wb") as f:
+            f.writelines(export_files(files, output, max(1, options["chunk_size"])))
+
+        self.stdout.write(self.style.SUCCESS(f"Files exported to '{path}'."))
@@ -1,52 +1,159 @@
+import fcntl
+import html
+import json
+import math
 import os
+import shutil
+import time
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db.models import Sum
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.utils import timezone
 
-from mousetube_api.models import PageView
+from mousetube_api.metrics import PAGE_VIEW_REPORT_PAGES, job_finished
+from mousetube_api.models import PageView, PageViewRollup
 
 LOGS_DIR = "logs/"
+LOCK_FILE = ".export_page_view.lock"
+
+# Buffered views are written at most PAGE_VIEW_FLUSH_INTERVAL seconds after
+# they were counted, possibly into the days before the last rolled-up one
+LATE_DAYS = math.ceil(getattr(settings, "PAGE_VIEW_FLUSH_INTERVAL", 10) / 86400)
 
 
 class Command(BaseCommand):
     help = "Export page views to a static HTML report"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--if-stale",
+            action="store_true",
+            help="Only regenerate the report if it was not generated today",
+        )
+
     def handle(self, *args, **kwargs):
+        # Only one process regenerates the report at a time, the others skip
+        with open(os.path.join(LOGS_DIR, LOCK_FILE), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.stdout.write("Page view report is already being generated.")
+                return
+
+            if kwargs["if_stale"] and not self.is_stale():
+                self.stdout.write("Page view report is up to date.")
+                return
+
+            self.export()
+
+    def is_stale(self):
+        latest_path = os.path.join(LOGS_DIR, "latest.html")
+        if not os.path.exists(latest_path):
+            return True
+        generated = datetime.fromtimestamp(os.path.getmtime(latest_path), tz=UTC)
+        return generated.date() < timezone.now().date()
+
+    def export(self):
+        started = time.time()
+        self.update_rollups()
+
         year = timezone.now().year
         filename = f"stats_{year}.html"
         output_path = os.path.join(LOGS_DIR, filename)
 
-        # Get all visites for the current year
-        views = PageView.objects.filter(date__year=year).order_by("date")
+        series = self.build_series(year)
+        pages = sorted(path for path in series if path)
+
+        with open(output_path, "w") as f:
+            f.write(self.render_html(series, year, pages))
+
+        # Save a "latest" file for the most recent page
+        shutil.copyfile(output_path, os.path.join(LOGS_DIR, "latest.html"))
+
+        PAGE_VIEW_REPORT_PAGES.set(len(pages))
+        job_finished("export_page_view", started)
+        self.stdout.write(self.style.SUCCESS(f"Exported stats to {output_path}"))
+
+    def update_rollups(self):
+        """
+        Bring the daily, weekly and monthly rollups up to date.
 
-        # Organize data by date and path for easy filtering
-        data = [
-            {"path": view.path, "date": view.date.isoformat(), "count": view.count}
-            for view in views
+        Only the days since the last run are aggregated. The last rolled-up
+        day may have been partial, and the buffered views of the days before
+        it may have been flushed after the previous run: days are recomputed
+        from ``LATE_DAYS`` before it, weeks and months from the start of the
+        period containing that first day, so that every level always sums the
+        same page views. Without daily rollups of the pages, every page view
+        is aggregated.
+        """
+        last_day = (
+            PageViewRollup.objects.filter(period="day")
+            .exclude(path="")
+            .aggregate(last=Max("start"))["last"]
+        )
+        if last_day is None:
+            last_day = PageView.objects.aggregate(first=Min("date"))["first"]
+            if last_day is None:
+                return
+
+        first_day = last_day - timedelta(days=LATE_DAYS)
+        periods = [
+            ("day", first_day, None),
+            ("week", first_day - timedelta(days=first_day.weekday()), TruncWeek),
+            ("month", first_day.replace(day=1), TruncMonth),
         ]
+        rollups = []
+        for period, since, trunc in periods:
+            views = PageView.objects.filter(date__gte=since).order_by()
+            views = views.annotate(start=trunc("date") if trunc else F("date"))
+            for fields in (["start"], ["path", "start"]):
+                rollups += [
+                    PageViewRollup(
+                        path=row.get("path", ""),
+                        period=period,
+                        start=row["start"],
+                        count=row["total"],
+                    )
+                    for row in views.values(*fields).annotate(total=Sum("count"))
+                ]
 
-        # Extract all unique pages for the page selector
-        pages = list(set(view["path"] for view in data))
+        PageViewRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=["path", "period", "start"],
+            update_fields=["count"],
+        )
 
-        # If you choose "All pages", group by date and add up the visits
-        total_data = []
-        for view in views.values("date").annotate(total_visits=Sum("count")):
-            total_data.append(
-                {"date": view["date"].isoformat(), "count": view["total_visits"]}
-            )
+    def build_series(self, year):
+        """
+        Collect the series embedded in the report from the rollups.
 
-        with open(output_path, "w") as f:
-            f.write(self.render_html(data, year, pages, total_data))
+        Returns:
+            dict: ``[date, count]`` pairs keyed by path ("" for all pages),
+                then by period.
+        """
+        series = defaultdict(lambda: {"day": [], "week": [], "month": []})
 
-        # Save a "latest" file for the most recent page
-        latest_path = os.path.join(LOGS_DIR, "latest.html")
-        with open(latest_path, "w") as f:
-            f.write(self.render_html(data, year, pages, total_data))
+        rollups = PageViewRollup.objects.filter(start__year=year).order_by("start")
+        for path, period, start, count in rollups.values_list(
+            "path", "period", "start", "count"
+        ).iterator():
+            series[path][period].append([start.isoformat(), count])
 
-        self.stdout.write(self.style.SUCCESS(f"Exported stats to {output_path}"))
+        return dict(series)
 
-    def render_html(self, data, year, pages, total_data):
+    def render_html(self, series, year, pages):
+        # Paths come from the tracked clients: escape them in the markup and
+        # keep "</script>" out of the embedded JSON
+        options = "".join(
+            f'<option value="{html.escape(page)}">{html.escape(page)}</option>'
+            for page in pages
+        )
+        series_json = json.dumps(series, separators=(",", ":")).replace("<", "\\u003c")
         return f"""
 <!DOCTYPE html>
 <html>
@@ -66,8 +173,16 @@ class Command(BaseCommand):
 <!-- Page selector -->
 <label for="page">Select a page:</label>
 <select id="page" style="margin-right: 20px;">
-    <option value="all">All pages</option>
-    {"".join([f'<option value="{page}">{page}</option>' for page in pages])}
+    <option value="">All pages</option>
+    {options}
+</select>
+
+<!-- Period selector -->
+<label for="period">Group by:</label>
+<select id="period" style="margin-right: 20px;">
+    <option value="day">Day</option>
+    <option value="week">Week</option>
+    <option value="month">Month</option>
 </select>
 
 <!-- Date selector -->
@@ -80,22 +195,18 @@ class Command(BaseCommand):
 </div>
 
 <script>
-const rawData = {data};
-const totalData = {total_data};
-
-function filterData(startDate, endDate, selectedPage) {{
-    let filteredData = selectedPage === 'all' ? totalData : rawData;
+// [date, count] pairs keyed by path ("" for all pages), then by period
+const series = {series_json};
 
-    if (selectedPage !== 'all') {{
-        filteredData = filteredData.filter(row => row.path === selectedPage);
-    }}
+function filterData(startDate, endDate, selectedPage, period) {{
+    let filteredData = (series[selectedPage] || {{}})[period] || [];
 
     if (startDate) {{
-        filteredData = filteredData.filter(row => new Date(row.date) >= new Date(startDate));
+        filteredData = filteredData.filter(row => new Date(row[0]) >= new Date(startDate));
     }}
 
     if (endDate) {{
-        filteredData = filteredData.filter(row => new Date(row.date) <= new Date(endDate));
+        filteredData = filteredData.filter(row => new Date(row[0]) <= new Date(endDate));
     }}
 
     return filteredData;
@@ -127,10 +238,11 @@ function updateChart() {{
     const startDate = document.getElementById('start-date').value;
     const endDate = document.getElementById('end-date').value;
     const selectedPage = document.getElementById('page').value;
+    const period = document.getElementById('period').value;
 
-    const data = filterData(startDate, endDate, selectedPage);
-    const labels = data.map(row => row.date);
-    const counts = data.map(row => row.count);
+    const data = filterData(startDate, endDate, selectedPage, period);
+    const labels = data.map(row => row[0]);
+    const counts = data.map(row => row[1]);
 
     chart.data.labels = labels;
     chart.data.datasets[0].data = counts;
@@ -143,6 +255,7 @@ document.getElementById('end-date').value = getTodayDate();
 updateChart();
 
 document.getElementById('page').addEventListener('change', updateChart);
+document.getElementById('period').addEventListener('change', updateChart);
 document.getElementById('start-date').addEventListener('change', updateChart);
 document.getElementById('end-date').addEventListener('change', updateChart);
 
@@ -0,0 +1,168 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers import base, python
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from mousetube_api.caching import touch
+from mousetube_api.dumps import CATALOG_MODELS, iter_records, open_dump
+from mousetube_api.search import refresh_documents
+from mousetube_api.signals import create_fulltext_indexes, drop_fulltext_indexes
+
+
+class Command(BaseCommand):
+    help = "Load a catalog fixture written by export_data with bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fixture",
+            help="Path of the fixture file, optionally compressed (.gz, .zst)",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=5000,
+            help="Number of rows inserted at once",
+        )
+        parser.add_argument(
+            "--defer_indexes",
+            action="store_true",
+            help="Drop the secondary indexes during the load and build them afterwards",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to load the fixture into",
+        )
+
+    def handle(self, *args, **options):
+        self.using = options["database"]
+        self.batch_size = max(1, options["batch_size"])
+        # Pending rows of each model, flushed in foreign key order
+        self.pending = {model: [] for model in CATALOG_MODELS}
+        self.pending_count = 0
+        # Many-to-many rows, inserted once both sides are loaded
+        self.relations = defaultdict(list)
+        self.loaded = defaultdict(int)
+
+        connection = connections[self.using]
+        if options["defer_indexes"]:
+            self.drop_indexes(connection)
+        try:
+            with transaction.atomic(using=self.using):
+                with connection.constraint_checks_disabled():
+                    with open_dump(options["fixture"], "r") as f:
+                        self.load(f)
+                    self.flush()
+                    self.insert_relations()
+                connection.check_constraints(
+                    table_names=[model._meta.db_table for model in self.loaded]
+                )
+                self.reset_sequences(connection)
+        finally:
+            if options["defer_indexes"]:
+                self.create_indexes(connection)
+
+        if options["defer_indexes"]:
+            drop_fulltext_indexes(self.using)
+        documents = refresh_documents()
+        create_fulltext_indexes(self.using)
+
+        # Bulk inserts do not send the signals invalidating API caches
+        for model in self.loaded:
+            touch(model)
+
+        if options["verbosity"] > 1:
+            for model, count in self.loaded.items():
+                self.stdout.write(f"{model._meta.label}: {count} rows")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {sum(self.loaded.values())} objects and rebuilt "
+                f"{documents} file search documents."
+            )
+        )
+
+    def load(self, stream):
+        objects = python.Deserializer(
+            iter_records(stream), using=self.using, ignorenonexistent=True
+        )
+        try:
+            for deserialized in objects:
+                self.add(deserialized)
+        except base.DeserializationError as e:
+            raise CommandError(f"Invalid fixture: {e}") from e
+
+    def add(self, deserialized):
+        instance = deserialized.object
+        model = type(instance)
+        if model not in self.pending:
+            raise CommandError(f"Unexpected model in fixture: {model._meta.label}")
+        if deserialized.deferred_fields:
+            raise CommandError("Natural keys are not supported, use primary keys.")
+
+        self.pending[model].append(instance)
+        self.pending_count += 1
+        for name, pks in (deserialized.m2m_data or {}).items():
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            self.relations[through].extend(
+                through(**{f"{source}_id": instance.pk, f"{target}_id": pk})
+                for pk in pks
+            )
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Parents are always inserted before the rows referencing them
+        for model, instances in self.pending.items():
+            if instances:
+                self.insert(model, instances)
+                self.loaded[model] += len(instances)
+                self.pending[model] = []
+        self.pending_count = 0
+
+    def insert_relations(self):
+        for through, rows in self.relations.items():
+            through._base_manager.using(self.using).bulk_create(
+                rows, batch_size=self.batch_size
+            )
+        self.relations.clear()
+
+    def insert(self, model, instances):
+        """
+        Insert rows as they are stored in the fixture.
+
+        Like ``loaddata``, values are written raw: ``auto_now`` dates keep
+        their exported value instead of being reset by ``bulk_create()``.
+        """
+        fields = model._meta.concrete_fields
+        manager = model._base_manager.using(self.using)
+        for start in range(0, len(instances), self.batch_size):
+            manager._insert(
+                instances[start : start + self.batch_size],
+                fields=fields,
+                using=self.using,
+                raw=True,
+            )
+
+    def reset_sequences(self, connection):
+        # Rows were inserted with explicit primary keys
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.loaded))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def drop_indexes(self, connection):
+        with connection.schema_editor() as editor:
+            for model in CATALOG_MODELS:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def create_indexes(self, connection):
+        with connection.schema_editor() as editor:
+            for model in CATALOG_MODELS:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
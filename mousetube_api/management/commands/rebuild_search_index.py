@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from mousetube_api.models import File, FileSearch
+from mousetube_api.search import refresh_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents of all files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--if-empty",
+            action="store_true",
+            help="Only rebuild the documents if there are files but no documents",
+        )
+
+    def handle(self, *args, **kwargs):
+        # The signal handlers keep the documents in sync once they are built
+        if kwargs["if_empty"] and (
+            FileSearch.objects.exists() or not File.objects.exists()
+        ):
+            self.stdout.write("File search documents are already built.")
+            return
+
+        written = refresh_documents()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {written} file search documents.")
+        )
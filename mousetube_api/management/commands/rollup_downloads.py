@@ -0,0 +1,88 @@
+import fcntl
+import os
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from mousetube_api.caching import touch
+from mousetube_api.models import DownloadEvent, File, FileDownload
+
+LOGS_DIR = "logs/"
+LOCK_FILE = ".rollup_downloads.lock"
+
+
+class Command(BaseCommand):
+    help = "Aggregate recorded download events into daily counts per file"
+
+    def handle(self, *args, **kwargs):
+        # Events are added to the daily counts then deleted: two concurrent
+        # runs would count them twice
+        with open(os.path.join(LOGS_DIR, LOCK_FILE), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.stdout.write("Downloads are already being rolled up.")
+                return
+
+            events, buckets = self.rollup()
+
+        if buckets:
+            touch(FileDownload)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled up {events} download events into {buckets} daily counts."
+            )
+        )
+
+    @transaction.atomic
+    def rollup(self):
+        """
+        Add the pending events to the ``FileDownload`` rows and delete them.
+
+        Events recorded while the rollup runs are left for the next run.
+
+        Returns:
+            tuple: The number of events and of daily counts written.
+        """
+        last = DownloadEvent.objects.aggregate(last=Max("pk"))["last"]
+        if last is None:
+            return 0, 0
+        # Locking read: events still being inserted below ``last`` are waited
+        # for, so the rows counted here are exactly the rows deleted below
+        events = DownloadEvent.objects.select_for_update().filter(pk__lte=last)
+
+        counts = defaultdict(Counter)
+        for pk, date, count in events.values_list("file_id", "date", "count"):
+            counts[date][pk] += count
+
+        pks = {pk for files in counts.values() for pk in files}
+        species = dict(File.objects.filter(pk__in=pks).values_list("pk", "species_id"))
+
+        rollups = []
+        for date, files in counts.items():
+            # Usually one or two days per run, each read with the unique index
+            stored = dict(
+                FileDownload.objects.filter(date=date, file_id__in=files).values_list(
+                    "file_id", "count"
+                )
+            )
+            rollups += [
+                FileDownload(
+                    file_id=pk,
+                    species_id=species.get(pk),
+                    date=date,
+                    count=stored.get(pk, 0) + count,
+                )
+                for pk, count in files.items()
+            ]
+
+        FileDownload.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=["file", "date"],
+            update_fields=["species", "count"],
+        )
+        deleted, _ = DownloadEvent.objects.filter(pk__lte=last).delete()
+        return deleted, len(rollups)
@@ -0,0 +1,148 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .instrumentation import view_name
+
+# Other methods are counted together, so clients cannot add label values
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# With several worker processes, PROMETHEUS_MULTIPROC_DIR must name a
+# directory shared by the workers and the management commands, emptied
+# before the server starts: every process then writes its metrics to
+# memory-mapped files there, and a scrape aggregates them.
+
+REQUEST_DURATION = Histogram(
+    "mousetube_request_duration_seconds",
+    "Time to handle a request, per URL name",
+    ["view", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+RESPONSES = Counter(
+    "mousetube_responses",
+    "Responses sent, per URL name and status code",
+    ["view", "status"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "mousetube_api_cache_lookups",
+    "Lookups of cached API responses",
+    ["result"],
+)
+CACHE_HITS = CACHE_LOOKUPS.labels(result="hit")
+CACHE_MISSES = CACHE_LOOKUPS.labels(result="miss")
+
+BUFFER_PENDING = Gauge(
+    "mousetube_buffer_pending_keys",
+    "Counters buffered in memory, waiting for the next flush",
+    ["buffer"],
+    multiprocess_mode="livesum",
+)
+BUFFER_FLUSHED = Counter(
+    "mousetube_buffer_flushed_keys",
+    "Counters written to the database",
+    ["buffer"],
+)
+BUFFER_FAILURES = Counter(
+    "mousetube_buffer_flush_failures",
+    "Flushes that failed and were retried later",
+    ["buffer"],
+)
+
+DEAD_LINK_CHECKS = Counter(
+    "mousetube_dead_links_checks",
+    "Links checked by check_dead_links, per result",
+    ["result"],
+)
+DEAD_LINK_RUN = Gauge(
+    "mousetube_dead_links_run_links",
+    "Links of the current or last check_dead_links run, per result",
+    ["result"],
+    multiprocess_mode="mostrecent",
+)
+
+PAGE_VIEW_REPORT_PAGES = Gauge(
+    "mousetube_page_view_report_pages",
+    "Pages in the last page view report",
+    multiprocess_mode="mostrecent",
+)
+
+JOB_LAST_SUCCESS = Gauge(
+    "mousetube_job_last_success_timestamp_seconds",
+    "End of the last successful run of a management command",
+    ["job"],
+    multiprocess_mode="mostrecent",
+)
+JOB_DURATION = Gauge(
+    "mousetube_job_last_duration_seconds",
+    "Duration of the last successful run of a management command",
+    ["job"],
+    multiprocess_mode="mostrecent",
+)
+
+
+def job_finished(job, started):
+    """
+    Publish the end of a successful run of a management command.
+
+    Args:
+        job (str): The command name.
+        started (float): ``time.time()`` at the start of the run.
+    """
+    finished = time.time()
+    JOB_LAST_SUCCESS.labels(job=job).set(finished)
+    JOB_DURATION.labels(job=job).set(finished - started)
+
+
+def render_metrics():
+    """
+    Return the metrics in the Prometheus text format.
+
+    In multiprocess mode, those of every process of the shared directory.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """
+    Observe the duration and status of every request, per URL name.
+
+    Disabled by ``METRICS_ENABLED = False``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        view = view_name(request)
+        method = request.method if request.method in HTTP_METHODS else "other"
+        REQUEST_DURATION.labels(view=view, method=method).observe(
+            time.perf_counter() - start
+        )
+        RESPONSES.labels(view=view, status=response.status_code).inc()
+        return response
@@ -8,6 +8,7 @@
 # Code under GPL v3.0 licence
 
 from django.db import models
+from django.utils import timezone
 
 
 class User(models.Model):
@@ -133,6 +134,10 @@ class Subject(models.Model):
     class Meta:
         verbose_name = "Subject"
         verbose_name_plural = "Subjects"
+        indexes = [
+            # File filters
+            models.Index(fields=["sex"], name="subject_sex_idx"),
+        ]
 
 
 class Protocol(models.Model):
@@ -209,6 +214,12 @@ class Experiment(models.Model):
     class Meta:
         verbose_name = "Experiment"
         verbose_name_plural = "Experiments"
+        indexes = [
+            # File filters
+            models.Index(fields=["date"], name="experiment_date_idx"),
+            models.Index(fields=["sampling_rate"], name="experiment_sampling_rate_idx"),
+            models.Index(fields=["laboratory"], name="experiment_laboratory_idx"),
+        ]
 
 
 class File(models.Model):
@@ -259,6 +270,198 @@ class File(models.Model):
     class Meta:
         verbose_name = "File"
         verbose_name_plural = "Files"
+        indexes = [
+            # Keyset pagination ordering
+            models.Index(fields=["name", "id"], name="file_name_id_idx"),
+            # has_spectrogram filter
+            models.Index(fields=["spectrogram"], name="file_spectrogram_idx"),
+        ]
+
+
+class FileSearch(models.Model):
+    """
+    Denormalized search document of a file.
+
+    The document concatenates the searchable fields of a file and of its
+    experiment, protocol, subject, strain, user and species, so that a search
+    is a single indexed lookup instead of a multi-table LIKE scan. It is kept
+    in sync by the signal handlers in ``mousetube_api.signals`` and carries a
+    FULLTEXT index on MariaDB.
+
+    Attributes:
+        file (File): The indexed file.
+        document (str): The searchable text of the file and its related records.
+    """
+
+    file = models.OneToOneField(
+        File, on_delete=models.CASCADE, primary_key=True, related_name="search"
+    )
+    document = models.TextField(default="")
+
+    def __str__(self):
+        """
+        Returns a string representation of the search document.
+
+        Returns:
+            str: The file and the beginning of its document.
+        """
+        return f"{self.file_id}: {self.document[:50]}"
+
+    class Meta:
+        verbose_name = "File search document"
+        verbose_name_plural = "File search documents"
+
+
+class LinkCheck(models.Model):
+    """
+    Represents the last check of the link of a file by ``check_dead_links``.
+
+    Attributes:
+        file (File): The checked file.
+        checked_at (datetime): When the link was last checked.
+        status_code (int, optional): The HTTP status of the last check, empty if the request failed.
+        etag (str): The ETag returned by the remote server, if any.
+        last_modified (str): The Last-Modified header returned by the remote server, if any.
+        error (str): The error raised by the last check, if any.
+    """
+
+    file = models.OneToOneField(
+        File, on_delete=models.CASCADE, primary_key=True, related_name="link_check"
+    )
+    checked_at = models.DateTimeField(db_index=True)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    etag = models.CharField(max_length=255, blank=True, default="")
+    last_modified = models.CharField(max_length=64, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        """
+        Returns a string representation of the link check.
+
+        Returns:
+            str: The file, status code and date of the check.
+        """
+        return f"{self.file_id}: {self.status_code or self.error} ({self.checked_at})"
+
+    class Meta:
+        verbose_name = "Link check"
+        verbose_name_plural = "Link checks"
+
+
+class DownloadEvent(models.Model):
+    """
+    Represents downloads of a file recorded by one flush of the download
+    counters.
+
+    Rows are only ever inserted, by ``mousetube_api.buffers``, then
+    aggregated into ``FileDownload`` and deleted by the ``rollup_downloads``
+    command.
+
+    Attributes:
+        file (File): The downloaded file.
+        date (date): The day of the downloads.
+        count (int): The number of downloads.
+    """
+
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        """
+        Returns a string representation of the download event.
+
+        Returns:
+            str: The file, date, and count of the downloads.
+        """
+        return f"{self.file_id} - {self.date} ({self.count})"
+
+
+class FileDownload(models.Model):
+    """
+    Represents the downloads of a file on a given day.
+
+    Maintained by the ``rollup_downloads`` command from the ``DownloadEvent``
+    rows. The species of the file is copied so that per-species series are
+    read without joining the files.
+
+    Attributes:
+        file (File): The downloaded file.
+        species (Species, optional): The species of the file.
+        date (date): The day of the downloads.
+        count (int): The number of downloads of the file on that day.
+    """
+
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name="+")
+    species = models.ForeignKey(
+        Species, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("file", "date")
+        indexes = [
+            # Per-species series
+            models.Index(fields=["species", "date"], name="filedownload_species_idx"),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the daily downloads.
+
+        Returns:
+            str: The file, date, and count of the downloads.
+        """
+        return f"{self.file_id} - {self.date} ({self.count})"
+
+
+class RequestProfile(models.Model):
+    """
+    Represents the profile of a request, run on demand by a staff user.
+
+    Written by ``mousetube_api.profiling.ProfilingMiddleware``, which only
+    keeps the latest ``PROFILE_KEEP`` profiles.
+
+    Attributes:
+        created_at (datetime): When the request was profiled.
+        user (str): The username of the staff user who asked for it.
+        method (str): The HTTP method of the request.
+        path (str): The path and query string of the request.
+        view (str): The URL name of the view.
+        status_code (int): The status code of the response.
+        duration_ms (float): The time to handle the request, in milliseconds.
+        query_count (int): The number of SQL queries.
+        db_ms (float): The time spent in SQL queries, in milliseconds.
+        folded (str): Sampled call stacks, one ``frame;frame;... count``
+            line per stack, as read by flame graph tools.
+        queries (list): The SQL queries, as ``{"sql", "ms"}`` items.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.CharField(max_length=150, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    view = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    folded = models.TextField(blank=True)
+    queries = models.JSONField(default=list)
+
+    class Meta:
+        verbose_name = "Request profile"
+        verbose_name_plural = "Request profiles"
+
+    def __str__(self):
+        """
+        Returns a string representation of the profile.
+
+        Returns:
+            str: The method, path and duration of the profiled request.
+        """
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
 
 
 class PageView(models.Model):
@@ -272,7 +475,7 @@ class PageView(models.Model):
     """
 
     path = models.CharField(max_length=255)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=timezone.localdate)
     count = models.PositiveIntegerField(default=0)
 
     class Meta:
@@ -288,6 +491,46 @@ class PageView(models.Model):
         return f"{self.path} - {self.date} ({self.count})"
 
 
+class PageViewRollup(models.Model):
+    """
+    Represents the page views of a page, or of all pages, over a period.
+
+    Maintained incrementally by the ``export_page_view`` command from the
+    daily ``PageView`` rows, so that reports read pre-aggregated series.
+
+    Attributes:
+        path (str): The path of the page, empty for the total of all pages.
+        period (str): The length of the period: day, week or month.
+        start (date): The first day of the period.
+        count (int): The number of views over the period.
+    """
+
+    PERIOD_CHOICES = [
+        ("day", "Day"),
+        ("week", "Week"),
+        ("month", "Month"),
+    ]
+
+    path = models.CharField(max_length=255, blank=True)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("path", "period", "start")
+
+    def __str__(self):
+        """
+        Returns a string representation of the rollup.
+
+        Returns:
+            str: The path, period, start date and count of the rollup.
+        """
+        return (
+            f"{self.path or 'all pages'} - {self.period} of {self.start} ({self.count})"
+        )
+
+
 class Reference(models.Model):
     """
     Model representing a reference (e.g., research paper, article, or website).
@@ -356,6 +599,10 @@ class Software(models.Model):
     class Meta:
         verbose_name = "Software"
         verbose_name_plural = "Software"
+        indexes = [
+            # Keyset pagination ordering
+            models.Index(fields=["name", "id"], name="software_name_id_idx"),
+        ]
 
 
 class Dataset(models.Model):
@@ -392,3 +639,41 @@ class Dataset(models.Model):
     class Meta:
         verbose_name = "Dataset"
         verbose_name_plural = "Datasets"
+        indexes = [
+            # Keyset pagination ordering
+            models.Index(fields=["name", "id"], name="dataset_name_id_idx"),
+            # Species filter, in the same ordering
+            models.Index(
+                fields=["species", "name", "id"], name="dataset_species_name_id_idx"
+            ),
+            # Creation date range filters
+            models.Index(fields=["created_at"], name="dataset_created_at_idx"),
+        ]
+
+
+class ModelChange(models.Model):
+    """
+    Change counter of a model, used to validate API responses.
+
+    Incremented by the signal handlers in ``mousetube_api.signals`` whenever a
+    row of the tracked model is saved or deleted, which gives models without
+    timestamps (File, Experiment, Subject...) a cheap ETag and Last-Modified.
+
+    Attributes:
+        model (str): The label of the tracked model, e.g. ``mousetube_api.file``.
+        version (int): The number of changes recorded for the model.
+        modified_at (datetime): When a row of the model last changed.
+    """
+
+    model = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """
+        Returns a string representation of the change counter.
+
+        Returns:
+            str: The model label, version and last modification time.
+        """
+        return f"{self.model} v{self.version} ({self.modified_at})"
@@ -0,0 +1,176 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class FilePagination(PageNumberPagination):
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a stable ``(name, id)`` ordering.
+
+    Each page is fetched with a ``WHERE (name, id) > (...)`` predicate that
+    walks the ``(name, id)`` index, so neither a ``COUNT(*)`` nor an
+    ``OFFSET`` is needed and deep pages cost the same as the first one. NULL
+    names sort first, as MariaDB orders them natively: ``ORDER BY name, id``
+    then needs no ``name IS NULL`` term, which the index could not serve.
+    Cursors are opaque tokens; the total is only computed when ``count=true``
+    is requested, and is then cached for ``count_timeout`` seconds.
+    """
+
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    count_query_param = "count"
+    page_size = FilePagination.page_size
+    page_size_query_param = FilePagination.page_size_query_param
+    max_page_size = FilePagination.max_page_size
+    count_timeout = 60 * 5
+    invalid_cursor_message = "Invalid cursor"
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            cls.cursor_query_param in request.query_params
+            or request.query_params.get(cls.mode_query_param) == "cursor"
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.name_nullable = queryset.model._meta.get_field("name").null
+        self.count = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor["r"]
+
+        if cursor is not None:
+            queryset = queryset.filter(self.position_filter(cursor, reverse))
+        queryset = queryset.order_by(*self.ordering(reverse))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self.position(results[-1])
+            if cursor is not None and (has_more or not reverse):
+                self.previous_position = self.position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_link(self.next_position, reverse=False),
+                "previous": self.get_link(self.previous_position, reverse=True),
+                "results": data,
+            }
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_count(self, queryset, request):
+        if request.query_params.get(self.count_query_param) != "true":
+            return None
+        sql, params = queryset.values("pk").query.sql_with_params()
+        fingerprint = hashlib.sha256(f"{sql}{params}".encode()).hexdigest()
+        cache_key = f"keyset-count-{fingerprint}"
+        count = cache.get(cache_key)
+        if count is None:
+            count = queryset.count()
+            cache.set(cache_key, count, self.count_timeout)
+        return count
+
+    def ordering(self, reverse):
+        # Plain "name" / "-name" on MariaDB, explicit on other databases
+        if reverse:
+            name = F("name").desc(nulls_last=True) if self.name_nullable else "-name"
+            return name, "-id"
+        name = F("name").asc(nulls_first=True) if self.name_nullable else "name"
+        return name, "id"
+
+    def position_filter(self, cursor, reverse):
+        """
+        Build the predicate selecting the rows after (or before, when going
+        backwards) a cursor position, NULL names sorting first.
+        """
+        name, pk = cursor["n"], cursor["i"]
+        if not reverse:
+            if name is None:
+                return Q(name__isnull=True, id__gt=pk) | Q(name__isnull=False)
+            return Q(name__gt=name) | Q(name=name, id__gt=pk)
+        if name is None:
+            return Q(name__isnull=True, id__lt=pk)
+        before = Q(name__lt=name) | Q(name=name, id__lt=pk)
+        return before | Q(name__isnull=True) if self.name_nullable else before
+
+    def position(self, instance):
+        return {"n": instance.name, "i": instance.pk}
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({**position, "r": reverse}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(cursor["i"], int) or not isinstance(
+                cursor["n"], str | None
+            ):
+                raise TypeError
+            cursor["r"] = bool(cursor.get("r"))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message) from None
+        return cursor
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(self.base_url, self.mode_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position, reverse)
+        )
+
+
+def get_paginator(request):
+    """
+    Return the paginator requested by a listing call.
+
+    Page-number pagination stays the default; ``?pagination=cursor`` or a
+    ``cursor`` parameter switches to keyset pagination.
+    """
+    if KeysetPagination.is_requested(request):
+        return KeysetPagination()
+    return FilePagination()
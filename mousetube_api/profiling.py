@@ -0,0 +1,213 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from .instrumentation import view_name
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEEP = getattr(settings, "PROFILE_KEEP", 50)
+PROFILE_INTERVAL = getattr(settings, "PROFILE_INTERVAL", 0.001)
+# Statements beyond this number are counted and timed but not stored.
+PROFILE_MAX_QUERIES = 1000
+
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+
+class StackSampler:
+    """
+    Sample the call stack of a thread at a regular interval.
+
+    A background thread reads the current frame of the profiled thread and
+    counts each distinct stack. The profiled code is not traced, so it runs
+    at its normal speed, but samples are only taken when the sampling thread
+    gets the GIL (see ``sys.setswitchinterval``).
+
+    Args:
+        thread_id (int): ``threading.get_ident()`` of the profiled thread.
+        root (frame, optional): Outermost frame of the recorded stacks, its
+            callers are left out.
+        interval (float): Time between two samples, in seconds.
+    """
+
+    def __init__(self, thread_id, root=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            names.append(f"{module}:{getattr(code, 'co_qualname', code.co_name)}")
+            if frame is self.root:
+                break
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def folded(self):
+        """
+        Return the samples in the folded format of flame graph tools
+        (``flamegraph.pl``, speedscope...), most frequent stacks first.
+        """
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self.stacks.most_common()
+        )
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper recording the SQL statements and their timings.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if len(self.queries) < PROFILE_MAX_QUERIES:
+                self.queries.append({"sql": sql, "ms": round(duration * 1000, 3)})
+
+
+def wants_profile(request):
+    return PROFILE_PARAM in request.GET or PROFILE_HEADER in request.META
+
+
+def staff_user(request):
+    """
+    Return the staff user sending a request, None for other users.
+
+    The API authenticates with tokens, which DRF only reads in the view: a
+    request without a staff session has its token checked here.
+    """
+    if request.user.is_staff:
+        return request.user
+    try:
+        authenticated = TokenAuthentication().authenticate(Request(request))
+    except AuthenticationFailed:
+        return None
+    if authenticated is not None and authenticated[0].is_staff:
+        return authenticated[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests of staff users that ask for it.
+
+    A request carrying the ``_profile`` query parameter or an ``X-Profile``
+    header, sent by a staff user (session or API token), runs under
+    ``StackSampler`` with its SQL statements recorded, and skips the response
+    cache and validators (see ``mousetube_api.caching``). The profile is stored as a ``RequestProfile``,
+    viewable in the admin, and its admin URL is returned in the
+    ``X-Profile`` response header. Only the latest ``PROFILE_KEEP``
+    profiles are kept.
+
+    Other requests only go through the flag lookup. Disabled by
+    ``PROFILING_ENABLED = False``. Must come after
+    ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = staff_user(request) if wants_profile(request) else None
+        if user is None:
+            return self.get_response(request)
+
+        request.profiled = True
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            sampler = stack.enter_context(
+                StackSampler(threading.get_ident(), root=sys._getframe())
+            )
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        try:
+            profile = save_profile(request, user, response, duration, sampler, recorder)
+        except Exception:
+            logger.exception("Failed to store the profile of %s", request.path)
+        else:
+            response["X-Profile"] = reverse(
+                "admin:mousetube_api_requestprofile_change", args=[profile.pk]
+            )
+        return response
+
+
+def save_profile(request, user, response, duration, sampler, recorder):
+    """
+    Store a request profile and drop those beyond ``PROFILE_KEEP``.
+
+    Returns:
+        RequestProfile: The stored profile.
+    """
+    profile = RequestProfile.objects.create(
+        user=user.get_username(),
+        method=request.method,
+        path=request.get_full_path(),
+        view=view_name(request),
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=recorder.count,
+        db_ms=recorder.duration * 1000,
+        folded=sampler.folded(),
+        queries=recorder.queries,
+    )
+    expired = RequestProfile.objects.order_by("-pk").values_list("pk", flat=True)[
+        PROFILE_KEEP:
+    ]
+    RequestProfile.objects.filter(pk__in=list(expired)).delete()
+    return profile
@@ -0,0 +1,136 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def eager_load(queryset, serializer):
+    """
+    Resolve the relations used by a serializer tree on a queryset.
+
+    Nested serializers on forward foreign keys become ``select_related`` joins,
+    nested ``many=True`` serializers become ``Prefetch`` objects whose own
+    queryset is resolved recursively, and the selected columns are restricted
+    with ``only()`` to the fields the serializer actually renders. A page of
+    results therefore costs a fixed number of queries, whatever its size.
+
+    Args:
+        queryset (QuerySet): The base queryset to optimize.
+        serializer (Serializer or type): The serializer (class or instance)
+            that will render the queryset.
+
+    Returns:
+        QuerySet: The queryset with its loading plan applied.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    select, prefetch, only = _resolve(queryset.model, serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only is not None:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+def serializer_models(serializer):
+    """
+    List the models whose rows appear in the output of a serializer tree.
+
+    Args:
+        serializer (Serializer or type): The serializer (class or instance).
+
+    Returns:
+        set: The model classes rendered by the serializer and its nested
+            serializers.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    model = serializer.Meta.model
+    models = {model}
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ListSerializer):
+            field = field.child
+        if isinstance(field, serializers.ModelSerializer):
+            models |= serializer_models(field)
+            continue
+        model_field = _model_field(model, field.source)
+        if model_field is not None and model_field.many_to_many:
+            # Primary keys of many-to-many relations live in the through table
+            models.add(model_field.related_model)
+    return models
+
+
+def _model_field(model, source):
+    if source == "*" or "." in source:
+        return None
+    try:
+        return model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+
+
+def _resolve(model, serializer, prefix=""):
+    """
+    Walk one level of a serializer tree.
+
+    Returns a ``(select_related, prefetch_related, only)`` triple with lookups
+    prefixed by ``prefix``. ``only`` is ``None`` when a field cannot be mapped
+    to a model column (method fields, dotted sources, properties...), in which
+    case every column is loaded.
+    """
+    select, prefetch = [], []
+    only = [prefix + model._meta.pk.name]
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        model_field = _model_field(model, field.source)
+        if model_field is None:
+            # Annotations are selected by the queryset itself, but properties
+            # and dotted sources may read any column.
+            if (
+                field.source == "*"
+                or "." in field.source
+                or hasattr(model, field.source)
+            ):
+                only = None
+            continue
+
+        lookup = prefix + field.source
+        many = isinstance(
+            field, serializers.ListSerializer | serializers.ManyRelatedField
+        )
+
+        if many:
+            related_qs = model_field.related_model._default_manager.all()
+            if isinstance(field, serializers.ListSerializer):
+                related_qs = eager_load(related_qs, field.child)
+            else:
+                related_qs = related_qs.only(model_field.related_model._meta.pk.name)
+            prefetch.append(Prefetch(lookup, queryset=related_qs))
+        elif isinstance(field, serializers.BaseSerializer) and model_field.many_to_one:
+            select.append(lookup)
+            nested_select, nested_prefetch, nested_only = _resolve(
+                model_field.related_model, field, lookup + "__"
+            )
+            select += nested_select
+            prefetch += nested_prefetch
+            if only is not None:
+                only = None if nested_only is None else only + [lookup] + nested_only
+        elif only is not None and model_field.concrete:
+            only.append(lookup)
+
+    return select, prefetch, only
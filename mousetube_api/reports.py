@@ -0,0 +1,49 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import logging
+import threading
+
+from django.core.management import call_command
+from django.db import connections
+from django.utils.timezone import now
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_scheduled_on = None
+
+
+def schedule_page_view_report():
+    """
+    Regenerate the page view report in the background, once a day.
+
+    Each process starts at most one background run per day; the
+    ``export_page_view`` command itself holds a file lock and skips reports
+    already generated today, so a single worker regenerates it. The caller
+    never waits for the report.
+    """
+    global _scheduled_on
+
+    today = now().date()
+    if _scheduled_on == today:
+        return
+    with _lock:
+        if _scheduled_on == today:
+            return
+        _scheduled_on = today
+
+    threading.Thread(
+        target=_export_page_view, name="export-page-view", daemon=True
+    ).start()
+
+
+def _export_page_view():
+    try:
+        call_command("export_page_view", if_stale=True, verbosity=0)
+    except Exception:
+        logger.exception("Failed to export the page view report")
+    finally:
+        connections.close_all()
@@ -0,0 +1,288 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, FloatField, Func, Lookup, Q, TextField
+
+from .models import (
+    Dataset,
+    Experiment,
+    File,
+    FileSearch,
+    Protocol,
+    Species,
+    Strain,
+    Subject,
+    User,
+)
+
+# Fields concatenated into the search document of a file, relative to File.
+SEARCH_FIELDS = [
+    # File
+    "number",
+    "link",
+    "notes",
+    "doi",
+    # Experiment
+    "experiment__name",
+    "experiment__laboratory",
+    "experiment__group_subject",
+    "experiment__temperature",
+    "experiment__light_cycle",
+    "experiment__microphone",
+    "experiment__acquisition_hardware",
+    "experiment__acquisition_software",
+    "experiment__sampling_rate",
+    "experiment__bit_depth",
+    "experiment__date",
+    # Subject
+    "subject__name",
+    "subject__origin",
+    "subject__sex",
+    "subject__group",
+    "subject__genotype",
+    "subject__treatment",
+    # User (related to Subject)
+    "subject__user__name_user",
+    "subject__user__first_name_user",
+    "subject__user__email_user",
+    "subject__user__unit_user",
+    "subject__user__institution_user",
+    "subject__user__address_user",
+    "subject__user__country_user",
+    # Strain (related to Subject)
+    "subject__strain__name",
+    "subject__strain__background",
+    "subject__strain__bibliography",
+    # Protocol (related to Experiment)
+    "experiment__protocol__name",
+    "experiment__protocol__number_files",
+    "experiment__protocol__description",
+    # Species
+    "species__name",
+]
+
+# Lookup from File to each model whose fields appear in the search document.
+DOCUMENT_DEPENDENCIES = {
+    File: "pk",
+    Experiment: "experiment",
+    Protocol: "experiment__protocol",
+    Subject: "subject",
+    User: "subject__user",
+    Strain: "subject__strain",
+    Species: "species",
+}
+
+# Columns of the Dataset FULLTEXT index, see signals.FULLTEXT_INDEXES. On
+# MariaDB the JSON metadata is a LONGTEXT column and can be indexed.
+DATASET_SEARCH_COLUMNS = ["name", "description", "metadata"]
+
+# Fields a dataset search can be restricted to, and their lookup from Dataset.
+DATASET_SEARCH_FIELDS = {
+    "name": "name",
+    "description": "description",
+    "species": "species__name",
+    "metadata": "metadata",
+}
+
+# Words shorter than the InnoDB FULLTEXT token size are not indexed.
+MIN_TOKEN_SIZE = getattr(settings, "SEARCH_MIN_TOKEN_SIZE", 3)
+
+CHUNK_SIZE = 500
+
+
+class Match(Lookup):
+    """
+    ``MATCH ... AGAINST`` boolean-mode lookup, only available on MySQL/MariaDB.
+    """
+
+    lookup_name = "match"
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return (
+            f"MATCH ({lhs}) AGAINST ({rhs} IN BOOLEAN MODE)",
+            (*lhs_params, *rhs_params),
+        )
+
+
+class Relevance(Func):
+    """
+    Relevance score of a ``MATCH ... AGAINST`` boolean-mode search.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, expression, query):
+        super().__init__(expression)
+        self.query = query
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"MATCH ({sql}) AGAINST (%s IN BOOLEAN MODE)", (*params, self.query)
+
+
+class Columns(Func):
+    """
+    Comma-separated column list, the left-hand side of a ``Match`` over a
+    multi-column FULLTEXT index.
+    """
+
+    template = "%(expressions)s"
+    arg_joiner = ", "
+    output_field = TextField()
+
+
+FileSearch._meta.get_field("document").register_lookup(Match)
+
+
+def build_document(values):
+    """
+    Join the searchable values of a file into a single document.
+
+    Args:
+        values (iterable): The values of ``SEARCH_FIELDS`` for one file.
+
+    Returns:
+        str: The search document.
+    """
+    return " ".join(str(value) for value in values if value not in (None, ""))
+
+
+def refresh_documents(file_ids=None):
+    """
+    Rebuild the search documents of some files.
+
+    Args:
+        file_ids (iterable, optional): The primary keys of the files to refresh.
+            All files are refreshed when omitted.
+
+    Returns:
+        int: The number of documents written.
+    """
+    files = File.objects.order_by("pk")
+    if file_ids is not None:
+        file_ids = list(file_ids)
+        if not file_ids:
+            return 0
+        files = files.filter(pk__in=file_ids)
+
+    written = 0
+    batch = []
+    for pk, *values in files.values_list("pk", *SEARCH_FIELDS).iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        batch.append(FileSearch(file_id=pk, document=build_document(values)))
+        if len(batch) >= CHUNK_SIZE:
+            written += _write(batch)
+            batch = []
+    if batch:
+        written += _write(batch)
+    return written
+
+
+def _write(documents):
+    FileSearch.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=["file"],
+        update_fields=["document"],
+    )
+    return len(documents)
+
+
+def affected_files(model, pk):
+    """
+    List the files whose search document includes a given row.
+
+    Args:
+        model (type): One of the models of ``DOCUMENT_DEPENDENCIES``.
+        pk (int): The primary key of the row.
+
+    Returns:
+        list: The primary keys of the affected files.
+    """
+    lookup = DOCUMENT_DEPENDENCIES[model]
+    return list(File.objects.filter(**{lookup: pk}).values_list("pk", flat=True))
+
+
+def search_files(queryset, query):
+    """
+    Filter a File queryset with a free-text search.
+
+    On MariaDB every word becomes a required prefix term of a FULLTEXT
+    boolean-mode search and the results are ranked by relevance. Queries with
+    words too short to be indexed, and other database backends, fall back to
+    a substring match on the search document, which still only scans a single
+    column.
+
+    Args:
+        queryset (QuerySet): The File queryset to filter.
+        query (str): The search text.
+
+    Returns:
+        QuerySet: The filtered queryset, ordered by relevance when ranked.
+    """
+    terms = re.findall(r"\w+", query)
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "mysql" and terms and all(len(t) >= MIN_TOKEN_SIZE for t in terms):
+        boolean_query = " ".join(f"+{term}*" for term in terms)
+        return (
+            queryset.filter(search__document__match=boolean_query)
+            .annotate(relevance=Relevance(F("search__document"), boolean_query))
+            .order_by("-relevance", F("name").asc(nulls_last=True), "pk")
+        )
+
+    return queryset.filter(search__document__icontains=query)
+
+
+def search_datasets(queryset, query, field=None):
+    """
+    Filter a Dataset queryset with a free-text search.
+
+    On MariaDB every word becomes a required prefix term of a FULLTEXT
+    boolean-mode search over ``DATASET_SEARCH_COLUMNS``, and species are
+    matched by name in their own small table. A search restricted to one
+    column is narrowed by the index, then matched as a substring of that
+    column. Queries with words too short to be indexed, and other database
+    backends, fall back to substring matches.
+
+    Args:
+        queryset (QuerySet): The Dataset queryset to filter.
+        query (str): The search text.
+        field (str, optional): One of ``DATASET_SEARCH_FIELDS`` to restrict
+            the search to. Every field is searched when None.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    if field == "species":
+        return queryset.filter(species__name__icontains=query)
+
+    terms = re.findall(r"\w+", query)
+    vendor = connections[queryset.db].vendor
+    if vendor != "mysql" or not terms or any(len(t) < MIN_TOKEN_SIZE for t in terms):
+        condition = Q()
+        for name in [field] if field else DATASET_SEARCH_FIELDS:
+            condition |= Q(**{f"{DATASET_SEARCH_FIELDS[name]}__icontains": query})
+        return queryset.filter(condition)
+
+    boolean_query = " ".join(f"+{term}*" for term in terms)
+    match = Match(Columns(*map(F, DATASET_SEARCH_COLUMNS)), boolean_query)
+    if field:
+        return queryset.filter(match, **{f"{field}__icontains": query})
+
+    # MATCH cannot use its index inside an OR: the matching datasets and
+    # species are looked up first, each through its own index
+    dataset_ids = list(Dataset.objects.filter(match).values_list("pk", flat=True))
+    species_ids = list(
+        Species.objects.filter(name__icontains=query).values_list("pk", flat=True)
+    )
+    return queryset.filter(Q(pk__in=dataset_ids) | Q(species__in=species_ids))
@@ -10,6 +10,7 @@
 
 from rest_framework import serializers
 
+from mousetube_api.compiled import CompiledListSerializer
 from mousetube_api.models import (
     Dataset,
     Experiment,
@@ -25,71 +26,202 @@ from mousetube_api.models import (
 )
 
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_field_paths(value):
+    """
+    Parse a comma-separated list of dotted field paths into a tree.
+
+    ``"id,experiment.name,experiment.protocol"`` gives
+    ``{"id": {}, "experiment": {"name": {}, "protocol": {}}}``.
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def sparse_fieldset(params):
+    """
+    Read the ``fields`` and ``expand`` query parameters.
+
+    Returns:
+        dict: ``fields`` and ``expand`` trees for a
+            ``DynamicFieldsModelSerializer``, None when not requested.
+    """
+    return {
+        name: parse_field_paths(params[name]) if name in params else None
+        for name in ("fields", "expand")
+    }
+
+
+def prune_fields(serializer, fields=None, expand=None):
+    """
+    Remove fields from a serializer tree and collapse nested serializers.
+
+    Args:
+        serializer (Serializer): The serializer to prune, in place.
+        fields (dict, optional): Tree of the fields to keep. An empty subtree
+            keeps a nested serializer whole. Every field is kept when None.
+        expand (dict, optional): Tree of the nested serializers to keep
+            nested. The others are rendered as primary keys. Every nested
+            serializer is kept when None.
+    """
+    for name in list(serializer.fields):
+        if fields is not None and name not in fields:
+            serializer.fields.pop(name)
+            continue
+
+        field = serializer.fields[name]
+        many = isinstance(field, serializers.ListSerializer)
+        nested = field.child if many else field
+        if not isinstance(nested, serializers.BaseSerializer):
+            continue
+
+        if expand is not None and name not in expand:
+            options = {} if field.source == name else {"source": field.source}
+            serializer.fields[name] = serializers.PrimaryKeyRelatedField(
+                read_only=True, many=many, **options
+            )
+            continue
+
+        prune_fields(
+            nested,
+            (fields or {}).get(name) or None,
+            None if expand is None else expand.get(name),
+        )
+
+
+def unknown_field_paths(serializer, tree, expandable=False, prefix=""):
+    """
+    List the paths of a ``fields`` or ``expand`` tree that name no field.
+
+    Args:
+        serializer (Serializer): The serializer the tree applies to, before
+            pruning.
+        tree (dict): The tree, see ``parse_field_paths``.
+        expandable (bool): Only accept nested serializers, as ``expand``
+            does.
+
+    Returns:
+        list: The unknown dotted paths.
+    """
+    unknown = []
+    for name, subtree in tree.items():
+        path = f"{prefix}{name}"
+        field = serializer.fields.get(name)
+        nested = getattr(field, "child", field)
+        if not isinstance(nested, serializers.BaseSerializer):
+            # Plain fields cannot be expanded and have no subfields
+            if field is None or expandable:
+                unknown.append(path)
+            else:
+                unknown += [f"{path}.{subname}" for subname in subtree]
+            continue
+        unknown += unknown_field_paths(nested, subtree, expandable, f"{path}.")
+    return unknown
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer taking ``fields`` and ``expand`` trees, see
+    ``prune_fields``. Paths naming no field raise a ``ValidationError``,
+    which API views answer with a 400.
+
+    Since ``eager_load`` walks the pruned tree, removed fields are not
+    selected and collapsed relations are not joined. Subclasses render lists
+    with a ``CompiledListSerializer`` by naming it as
+    ``Meta.list_serializer_class``.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None or expand is not None:
+            errors = {}
+            for name, tree in (("fields", fields), ("expand", expand)):
+                unknown = unknown_field_paths(self, tree or {}, name == "expand")
+                if unknown:
+                    errors[name] = [f"Unknown fields: {', '.join(unknown)}."]
+            if errors:
+                raise serializers.ValidationError(errors)
+            prune_fields(self, fields, expand)
+
+
+class UserSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = User
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class SpeciesSerializer(serializers.ModelSerializer):
+class SpeciesSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Species
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class StrainSerializer(serializers.ModelSerializer):
+class StrainSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Strain
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(DynamicFieldsModelSerializer):
     user = UserSerializer(read_only=True)
     strain = StrainSerializer(read_only=True)
 
     class Meta:
         model = Subject
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class ProtocolSerializer(serializers.ModelSerializer):
+class ProtocolSerializer(DynamicFieldsModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = Protocol
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class ExperimentSerializer(serializers.ModelSerializer):
+class ExperimentSerializer(DynamicFieldsModelSerializer):
     protocol = ProtocolSerializer(read_only=True)
 
     class Meta:
         model = Experiment
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class FileSerializer(serializers.ModelSerializer):
+class FileSerializer(DynamicFieldsModelSerializer):
     experiment = ExperimentSerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     species = SpeciesSerializer(read_only=True)
 
     class Meta:
         model = File
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class ReferenceSerializer(serializers.ModelSerializer):
+class ReferenceSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Reference
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
-class SoftwareSerializer(serializers.ModelSerializer):
+class SoftwareSerializer(DynamicFieldsModelSerializer):
     users = UserSerializer(many=True, read_only=True)
     references = ReferenceSerializer(many=True, read_only=True)
 
     class Meta:
         model = Software
+        list_serializer_class = CompiledListSerializer
         fields = "__all__"
 
 
@@ -103,17 +235,62 @@ class TrackPageSerializer(serializers.Serializer):
     path = serializers.CharField(max_length=255)
 
 
-class DatasetSerializer(serializers.ModelSerializer):
+class FileDownloadsSerializer(serializers.Serializer):
+    # Ids of downloaded files, repeated for several downloads of a file
+    files = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000
+    )
+
+
+class DownloadSeriesSerializer(serializers.Serializer):
+    # Query parameters of the download time series, see downloads.download_series
+    period = serializers.ChoiceField(choices=["day", "month"], default="day")
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+
+class FileFilterSerializer(serializers.Serializer):
+    # Typed query parameters of the file listing, see filters.filter_files
+    species = serializers.IntegerField(required=False, min_value=1)
+    strain = serializers.IntegerField(required=False, min_value=1)
+    protocol = serializers.IntegerField(required=False, min_value=1)
+    sex = serializers.ChoiceField(choices=Subject.SEX_CHOICES, required=False)
+    laboratory = serializers.CharField(required=False, max_length=255)
+    date_after = serializers.DateField(required=False)
+    date_before = serializers.DateField(required=False)
+    sampling_rate_min = serializers.FloatField(required=False)
+    sampling_rate_max = serializers.FloatField(required=False)
+    has_spectrogram = serializers.BooleanField(
+        required=False, allow_null=True, default=None
+    )
+
+
+class DatasetFilterSerializer(serializers.Serializer):
+    # Typed query parameters of the dataset listing, see filters.filter_datasets
+    species = serializers.IntegerField(required=False, min_value=1)
+    created_after = serializers.DateField(required=False)
+    created_before = serializers.DateField(required=False)
+
+
+class DatasetSummarySerializer(DynamicFieldsModelSerializer):
+    # Counts and facets are computed by mousetube_api.facets, the files
+    # themselves are listed by /api/dataset/<id>/files/
+
     species = SpeciesSerializer(read_only=True)
-    files = FileSerializer(many=True, read_only=True)
+    file_count = serializers.IntegerField(read_only=True)
+    total_downloads = serializers.IntegerField(read_only=True)
+    facets = serializers.JSONField(read_only=True)
 
     class Meta:
         model = Dataset
+        list_serializer_class = CompiledListSerializer
         fields = [
             "id",
             "name",
-            "files",
             "description",
             "metadata",
             "species",
+            "file_count",
+            "total_downloads",
+            "facets",
         ]
@@ -93,12 +93,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mousetube_api.metrics.MetricsMiddleware",
+    "mousetube_api.instrumentation.RequestInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "mousetube_api.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -139,6 +142,49 @@ DATABASES = {
 }
 
 
+# Cache
+# Entries are keyed on the ModelChange versions stored in the database, so
+# every backend invalidates correctly. The default local-memory cache is per
+# process: use a shared backend (e.g. CACHE_URL=redis://...) to share the
+# entries between workers
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+API_CACHE_TIMEOUT = env.int("API_CACHE_TIMEOUT", default=60 * 60)
+
+# Page views are buffered in memory by each worker and written in bulk
+PAGE_VIEW_BUFFER_SIZE = env.int("PAGE_VIEW_BUFFER_SIZE", default=500)
+PAGE_VIEW_FLUSH_INTERVAL = env.float("PAGE_VIEW_FLUSH_INTERVAL", default=10)
+
+# Same for file download counters
+DOWNLOAD_BUFFER_SIZE = env.int("DOWNLOAD_BUFFER_SIZE", default=500)
+DOWNLOAD_FLUSH_INTERVAL = env.float("DOWNLOAD_FLUSH_INTERVAL", default=10)
+
+# Server-Timing headers, per-view histograms and slow request logs
+REQUEST_INSTRUMENTATION = env.bool("REQUEST_INSTRUMENTATION", default=False)
+SLOW_REQUEST_MS = env.float("SLOW_REQUEST_MS", default=1000)
+SLOW_REQUEST_QUERIES = env.int("SLOW_REQUEST_QUERIES", default=50)
+
+# Prometheus metrics, served at /metrics to staff users and to these
+# addresses (e.g. the scraper). Set PROMETHEUS_MULTIPROC_DIR with several
+# workers, see mousetube_api.metrics
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=[])
+# The addresses are checked against REMOTE_ADDR: nginx does not route
+# /metrics, scrapers must reach web:8000 directly on the compose network.
+# Behind a proxy setting X-Real-IP, and only if clients cannot reach web:8000
+# without it (they could forge the header), enable this to check the header
+METRICS_TRUST_X_REAL_IP = env.bool("METRICS_TRUST_X_REAL_IP", default=False)
+
+# Staff users can profile a request with ?_profile or an X-Profile header,
+# the latest PROFILE_KEEP profiles are kept in the admin
+PROFILING_ENABLED = env.bool("PROFILING_ENABLED", default=True)
+PROFILE_KEEP = env.int("PROFILE_KEEP", default=50)
+PROFILE_INTERVAL = env.float("PROFILE_INTERVAL", default=0.001)
+
+# Words shorter than innodb_ft_min_token_size are not in the FULLTEXT index,
+# searches containing them fall back to a substring match
+SEARCH_MIN_TOKEN_SIZE = env.int("SEARCH_MIN_TOKEN_SIZE", default=3)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -192,6 +238,10 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "mousetube_api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
     ],
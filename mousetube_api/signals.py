@@ -0,0 +1,125 @@
+# Copyright: CNRS - INSERM - UNISTRA - ICS - IGBMC
+# CNRS - Mouse Clinical Institute
+# PHENOMIN, CNRS UMR7104, INSERM U964, Université de Strasbourg
+# Code under GPL v3.0 licence
+
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .caching import touch
+from .models import (
+    Dataset,
+    DownloadEvent,
+    File,
+    FileSearch,
+    LinkCheck,
+    ModelChange,
+    PageView,
+    PageViewRollup,
+    RequestProfile,
+)
+from .search import (
+    DATASET_SEARCH_COLUMNS,
+    DOCUMENT_DEPENDENCIES,
+    affected_files,
+    refresh_documents,
+)
+
+# Models that are never rendered by the cached API responses
+UNCACHED_MODELS = (
+    DownloadEvent,
+    FileSearch,
+    LinkCheck,
+    ModelChange,
+    PageView,
+    PageViewRollup,
+    RequestProfile,
+)
+
+FULLTEXT_INDEXES = [
+    (FileSearch, "filesearch_document_ft", ["document"]),
+    (Dataset, "dataset_search_ft", DATASET_SEARCH_COLUMNS),
+]
+
+
+def create_fulltext_indexes(using="default", **kwargs):
+    """
+    Create the FULLTEXT indexes that Django cannot declare on MySQL/MariaDB.
+
+    Connected to ``post_migrate`` by the application config.
+    """
+    connection = connections[using]
+    if connection.vendor != "mysql":
+        return
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model, name, columns in FULLTEXT_INDEXES:
+            table = model._meta.db_table
+            if name in connection.introspection.get_constraints(cursor, table):
+                continue
+            cursor.execute(
+                f"CREATE FULLTEXT INDEX {quote(name)} ON {quote(table)} "
+                f"({', '.join(quote(column) for column in columns)})"
+            )
+
+
+def drop_fulltext_indexes(using="default"):
+    """
+    Drop the FULLTEXT indexes, so that a bulk load does not maintain them row
+    by row. ``create_fulltext_indexes`` builds them again in one pass.
+    """
+    connection = connections[using]
+    if connection.vendor != "mysql":
+        return
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model, name, _ in FULLTEXT_INDEXES:
+            table = model._meta.db_table
+            if name in connection.introspection.get_constraints(cursor, table):
+                cursor.execute(f"DROP INDEX {quote(name)} ON {quote(table)}")
+
+
+@receiver(post_save)
+def refresh_search_on_save(sender, instance, raw=False, **kwargs):
+    if raw or sender not in DOCUMENT_DEPENDENCIES:
+        return
+    refresh_documents(affected_files(sender, instance.pk))
+
+
+@receiver(pre_delete)
+def collect_search_on_delete(sender, instance, **kwargs):
+    # Files of a deleted species fall back to the default species, so their
+    # documents must be rebuilt once the row is gone.
+    if sender not in DOCUMENT_DEPENDENCIES or sender is File:
+        return
+    instance._search_file_ids = affected_files(sender, instance.pk)
+
+
+@receiver(post_delete)
+def refresh_search_on_delete(sender, instance, **kwargs):
+    file_ids = getattr(instance, "_search_file_ids", None)
+    if file_ids:
+        refresh_documents(file_ids)
+
+
+def _is_cached(model):
+    return model._meta.app_label == "mousetube_api" and model not in UNCACHED_MODELS
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cache_on_change(sender, **kwargs):
+    if _is_cached(sender):
+        touch(sender)
+
+
+@receiver(m2m_changed)
+def invalidate_cache_on_m2m_change(sender, instance, action, model, **kwargs):
+    if not action.startswith("post_"):
+        return
+    for changed in (type(instance), model):
+        if _is_cached(changed):
+            touch(changed)
@@ -28,30 +28,66 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     DatasetAPIView,
+    DatasetFilesAPIView,
+    DownloadSeriesAPIView,
     ExperimentAPIView,
     FileAPIView,
     FileDetailAPIView,
+    FileDownloadAPIView,
+    FileDownloadsAPIView,
+    FileExportAPIView,
+    FileFacetsAPIView,
     ProtocolAPIView,
     SoftwareAPIView,
     StrainAPIView,
     SubjectAPIView,
     TrackPageView,
     UserAPIView,
+    metrics_view,
+    request_histograms_view,
 )
 
 router = DefaultRouter()
 
 urlpatterns = [
     path("api/", include(router.urls)),
-    path("api/user/", UserAPIView.as_view()),
-    path("api/strain/", StrainAPIView.as_view()),
-    path("api/subject/", SubjectAPIView.as_view()),
-    path("api/protocol/", ProtocolAPIView.as_view()),
-    path("api/experiment/", ExperimentAPIView.as_view()),
-    path("api/software/", SoftwareAPIView.as_view()),
-    path("api/dataset/", DatasetAPIView.as_view()),
+    path("api/user/", UserAPIView.as_view(), name="user-list"),
+    path("api/strain/", StrainAPIView.as_view(), name="strain-list"),
+    path("api/subject/", SubjectAPIView.as_view(), name="subject-list"),
+    path("api/protocol/", ProtocolAPIView.as_view(), name="protocol-list"),
+    path("api/experiment/", ExperimentAPIView.as_view(), name="experiment-list"),
+    path("api/software/", SoftwareAPIView.as_view(), name="software-list"),
+    path("api/dataset/", DatasetAPIView.as_view(), name="dataset-list"),
+    path(
+        "api/dataset/<int:pk>/files/",
+        DatasetFilesAPIView.as_view(),
+        name="dataset-files",
+    ),
+    path(
+        "api/dataset/<int:pk>/downloads/",
+        DownloadSeriesAPIView.as_view(scope="dataset"),
+        name="dataset-downloads",
+    ),
     path("api/file/", FileAPIView.as_view(), name="file-list"),
+    path("api/file/facets/", FileFacetsAPIView.as_view(), name="file-facets"),
+    path("api/file/export/", FileExportAPIView.as_view(), name="file-export"),
+    path("api/file/downloads/", FileDownloadsAPIView.as_view(), name="file-downloads"),
     path("api/file/<int:pk>/", FileDetailAPIView.as_view(), name="file-detail"),
+    path(
+        "api/file/<int:pk>/download/",
+        FileDownloadAPIView.as_view(),
+        name="file-download",
+    ),
+    path(
+        "api/file/<int:pk>/downloads/",
+        DownloadSeriesAPIView.as_view(scope="file"),
+        name="file-downloads-series",
+    ),
+    path(
+        "api/species/<int:pk>/downloads/",
+        DownloadSeriesAPIView.as_view(scope="species"),
+        name="species-downloads",
+    ),
     path("api/track-page/", TrackPageView.as_view(), name="track-page"),
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
@@ -66,6 +102,8 @@ urlpatterns = [
         },
         name="admin-stats",
     ),
+    path("metrics", metrics_view, name="metrics"),
+    path("metrics/requests", request_histograms_view, name="request-histograms"),
     path("admin/", admin.site.urls),
 ]
 
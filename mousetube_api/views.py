@@ -8,92 +8,184 @@
 # Code under GPL v3.0 licence
 
 import os
+from collections import Counter
 
 from django.conf import settings
-from django.core.cache import cache
-from django.core.management import call_command
 from django.db.models import F, Q
-from django.shortcuts import render
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import add_never_cache_headers
 from django.utils.timezone import now
 from drf_spectacular.utils import OpenApiParameter, extend_schema
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .buffers import count_download, page_views
+from .caching import cache_response, conditional_response
+from .downloads import DOWNLOAD_SCOPES, download_series
+from .exports import EXPORT_OUTPUTS, export_files, parquet_available
+from .facets import annotate_dataset_summaries, attach_dataset_facets, file_facets
+from .filters import filter_datasets, filter_files
+from .instrumentation import request_histograms
+from .metrics import render_metrics
 from .models import (
     Dataset,
     Experiment,
     File,
-    PageView,
+    FileDownload,
     Protocol,
     Software,
+    Species,
     Strain,
     Subject,
     User,
 )
+from .pagination import get_paginator
+from .querysets import eager_load
+from .renderers import is_streaming, streaming_content, streaming_response
+from .reports import schedule_page_view_report
+from .search import DOCUMENT_DEPENDENCIES
 from .serializers import (
-    DatasetSerializer,
+    DatasetFilterSerializer,
+    DatasetSummarySerializer,
+    DownloadSeriesSerializer,
     ExperimentSerializer,
+    FileDownloadsSerializer,
+    FileFilterSerializer,
     FileSerializer,
-    PageViewSerializer,
     ProtocolSerializer,
     SoftwareSerializer,
     StrainSerializer,
     SubjectSerializer,
     TrackPageSerializer,
     UserSerializer,
+    sparse_fieldset,
 )
 
-
-class FilePagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = "page_size"
-    max_page_size = 100
+# ?fields= and ?expand= of the list endpoints, see serializers.prune_fields
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        description="comma-separated fields to return, nested ones as "
+        "'experiment.name'",
+        required=False,
+        type=str,
+    ),
+    OpenApiParameter(
+        name="expand",
+        description="comma-separated relations to nest, as 'experiment' or "
+        "'experiment.protocol'; the others are returned as ids. All relations "
+        "are nested when omitted",
+        required=False,
+        type=str,
+    ),
+]
+
+# Unpaginated full-table endpoints
+FULL_LIST_PARAMETERS = [
+    *SPARSE_FIELDSET_PARAMETERS,
+    OpenApiParameter(
+        name="stream",
+        description="set to 1 to stream the JSON array in chunks",
+        required=False,
+        type=str,
+    ),
+]
 
 
 class UserAPIView(APIView):
     serializer_class = UserSerializer
 
+    @extend_schema(parameters=FULL_LIST_PARAMETERS)
+    @conditional_response
+    @cache_response()
     def get(self, *arg, **kwargs):
-        user = User.objects.all()
-        serializer = self.serializer_class(user, many=True)
+        fieldset = sparse_fieldset(self.request.query_params)
+        user = eager_load(User.objects.all(), self.serializer_class(**fieldset))
+        if is_streaming(self.request):
+            return streaming_response(
+                self.request, user, self.serializer_class(many=True, **fieldset)
+            )
+        serializer = self.serializer_class(user, many=True, **fieldset)
         return Response(serializer.data)
 
 
 class StrainAPIView(APIView):
     serializer_class = StrainSerializer
 
+    @extend_schema(parameters=FULL_LIST_PARAMETERS)
+    @conditional_response
+    @cache_response()
     def get(self, *arg, **kwargs):
-        strain = Strain.objects.all()
-        serializers = self.serializer_class(strain, many=True)
+        fieldset = sparse_fieldset(self.request.query_params)
+        strain = eager_load(Strain.objects.all(), self.serializer_class(**fieldset))
+        if is_streaming(self.request):
+            return streaming_response(
+                self.request, strain, self.serializer_class(many=True, **fieldset)
+            )
+        serializers = self.serializer_class(strain, many=True, **fieldset)
         return Response(serializers.data)
 
 
 class SubjectAPIView(APIView):
     serializer_class = SubjectSerializer
 
+    @extend_schema(parameters=FULL_LIST_PARAMETERS)
+    @conditional_response
+    @cache_response()
     def get(self, *arg, **kwargs):
-        subject = Subject.objects.all()
-        serializers = self.serializer_class(subject, many=True)
+        fieldset = sparse_fieldset(self.request.query_params)
+        subject = eager_load(Subject.objects.all(), self.serializer_class(**fieldset))
+        if is_streaming(self.request):
+            return streaming_response(
+                self.request, subject, self.serializer_class(many=True, **fieldset)
+            )
+        serializers = self.serializer_class(subject, many=True, **fieldset)
         return Response(serializers.data)
 
 
 class ProtocolAPIView(APIView):
     serializer_class = ProtocolSerializer
 
+    @extend_schema(parameters=FULL_LIST_PARAMETERS)
+    @conditional_response
+    @cache_response()
     def get(self, *arg, **kwargs):
-        protocol = Protocol.objects.all()
-        serializers = self.serializer_class(protocol, many=True)
+        fieldset = sparse_fieldset(self.request.query_params)
+        protocol = eager_load(Protocol.objects.all(), self.serializer_class(**fieldset))
+        if is_streaming(self.request):
+            return streaming_response(
+                self.request, protocol, self.serializer_class(many=True, **fieldset)
+            )
+        serializers = self.serializer_class(protocol, many=True, **fieldset)
         return Response(serializers.data)
 
 
 class ExperimentAPIView(APIView):
     serializer_class = ExperimentSerializer
 
+    @extend_schema(parameters=FULL_LIST_PARAMETERS)
+    @conditional_response
+    @cache_response()
     def get(self, *arg, **kwargs):
-        experiment = Experiment.objects.all()
-        serializers = self.serializer_class(experiment, many=True)
+        fieldset = sparse_fieldset(self.request.query_params)
+        experiment = eager_load(
+            Experiment.objects.all(), self.serializer_class(**fieldset)
+        )
+        if is_streaming(self.request):
+            return streaming_response(
+                self.request, experiment, self.serializer_class(many=True, **fieldset)
+            )
+        serializers = self.serializer_class(experiment, many=True, **fieldset)
         return Response(serializers.data)
 
 
@@ -102,161 +194,196 @@ class FileAPIView(APIView):
 
     @extend_schema(
         parameters=[
+            FileFilterSerializer,
             OpenApiParameter(
                 name="search", description="text search", required=False, type=str
             ),
             OpenApiParameter(
                 name="filter", description="filter", required=False, type=str
             ),
+            OpenApiParameter(
+                name="pagination",
+                description="set to 'cursor' to use keyset pagination",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="cursor",
+                description="keyset pagination cursor",
+                required=False,
+                type=str,
+            ),
+            *SPARSE_FIELDSET_PARAMETERS,
         ]
     )
+    @conditional_response
+    @cache_response(first_page_only=True)
     def get(self, request, *args, **kwargs):
-        search_query = request.GET.get("search", "")
-        filter_query = request.GET.get("filter", "")
-        files = File.objects.all()
-        if search_query:
-            file_fields = ["number", "link", "notes", "doi"]
-
-            # Fields for Experiment model
-            experiment_fields = [
-                "name",
-                "laboratory",
-                "group_subject",
-                "temperature",
-                "light_cycle",
-                "microphone",
-                "acquisition_hardware",
-                "acquisition_software",
-                "sampling_rate",
-                "bit_depth",
-                "date",
-            ]
-
-            # Fields for Subject model
-            subject_fields = [
-                "name",
-                "origin",
-                "sex",
-                "group",
-                "genotype",
-                "treatment",
-            ]
-
-            # Fields for User model (related to Subject)
-            user_fields = [
-                "name_user",
-                "first_name_user",
-                "email_user",
-                "unit_user",
-                "institution_user",
-                "address_user",
-                "country_user",
-            ]
-
-            # Fields for Strain model (related to Subject)
-            strain_fields = ["name", "background", "bibliography"]
-
-            # Fields for Protocol model (related to Experiment)
-            protocol_fields = ["name", "number_files", "description"]
-
-            # Fields for Species model
-            species_fields = ["name"]
-
-            # Build dynamic Q objects for File fields
-            file_query = Q()
-            for field in file_fields:
-                file_query |= Q(**{f"{field}__icontains": search_query})
-
-            # Build dynamic Q objects for Experiment fields
-            experiment_query = Q()
-            for field in experiment_fields:
-                experiment_query |= Q(
-                    **{f"experiment__{field}__icontains": search_query}
-                )
-
-            # Build dynamic Q objects for Subject fields
-            subject_query = Q()
-            for field in subject_fields:
-                subject_query |= Q(**{f"subject__{field}__icontains": search_query})
-
-            # Build dynamic Q objects for User fields (via Subject)
-            user_query = Q()
-            for field in user_fields:
-                user_query |= Q(**{f"subject__user__{field}__icontains": search_query})
+        fieldset = sparse_fieldset(request.query_params)
+        files = filter_files(
+            eager_load(File.objects.all(), self.serializer_class(**fieldset)),
+            request.GET,
+        )
 
-            # Build dynamic Q objects for Strain fields (via Subject)
-            strain_query = Q()
-            for field in strain_fields:
-                strain_query |= Q(
-                    **{f"subject__strain__{field}__icontains": search_query}
-                )
+        # Add explicit ordering to avoid UnorderedObjectListWarning,
+        # unless the search already ranked the results by relevance
+        if not files.ordered:
+            files = files.order_by(F("name").asc(nulls_last=True))
+        paginator = get_paginator(request)
+        paginated_files = paginator.paginate_queryset(files, request)
+        serializer = self.serializer_class(paginated_files, many=True, **fieldset)
+        return paginator.get_paginated_response(serializer.data)
 
-            # Build dynamic Q objects for Protocol fields (via Experiment)
-            protocol_query = Q()
-            for field in protocol_fields:
-                protocol_query |= Q(
-                    **{f"experiment__protocol__{field}__icontains": search_query}
-                )
 
-            # Build dynamic Q objects for Species field
-            species_query = Q()
-            for field in species_fields:
-                species_query |= Q(**{f"species__{field}__icontains": search_query})
-
-            # Combine all queries
-            files = files.filter(
-                file_query
-                | experiment_query
-                | subject_query
-                | user_query
-                | strain_query
-                | protocol_query
-                | species_query
+class FileExportAPIView(APIView):
+    @extend_schema(
+        parameters=[
+            FileFilterSerializer,
+            OpenApiParameter(
+                name="output",
+                description="ndjson (default), csv or parquet",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="search", description="text search", required=False, type=str
+            ),
+            OpenApiParameter(
+                name="filter", description="filter", required=False, type=str
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        output = request.GET.get("output", "ndjson")
+        if output not in EXPORT_OUTPUTS:
+            raise ValidationError(
+                {"output": [f"Choose one of: {', '.join(EXPORT_OUTPUTS)}."]}
+            )
+        if output == "parquet" and not parquet_available():
+            raise ValidationError(
+                {"output": ["Parquet export is not available on this server."]}
             )
 
-        ALLOWED_FILTERS = ["is_valid_link"]
+        files = filter_files(File.objects.all(), request.GET)
+        content_type, extension = EXPORT_OUTPUTS[output]
+        response = StreamingHttpResponse(
+            streaming_content(request, export_files(files, output)),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="mousetube_files.{extension}"'
+        )
+        return response
 
-        # Apply filters
-        if filter_query:
-            for filter_name in filter_query.split(","):
-                if filter_name not in ALLOWED_FILTERS:
-                    continue  # Ignore invalid filters
 
-                if filter_name == "is_valid_link":
-                    files = files.filter(is_valid_link=True)
+class FileFacetsAPIView(APIView):
+    # Models whose columns are grouped, used as labels, or part of the search
+    # documents matched by ?search=
+    cache_models = tuple(DOCUMENT_DEPENDENCIES)
 
-        # Add explicit ordering to avoid UnorderedObjectListWarning
-        files = files.order_by(F("name").asc(nulls_last=True))
-        paginator = FilePagination()
-        paginated_files = paginator.paginate_queryset(files, request)
-        serializer = self.serializer_class(paginated_files, many=True)
-        return paginator.get_paginated_response(serializer.data)
+    @extend_schema(
+        parameters=[
+            FileFilterSerializer,
+            OpenApiParameter(
+                name="search", description="text search", required=False, type=str
+            ),
+            OpenApiParameter(
+                name="filter", description="filter", required=False, type=str
+            ),
+        ]
+    )
+    @conditional_response
+    @cache_response()
+    def get(self, request, *args, **kwargs):
+        files = filter_files(File.objects.all(), request.GET)
+        return Response(file_facets(files))
 
 
 class FileDetailAPIView(APIView):
     @extend_schema(exclude=True)
     def patch(self, request, *args, **kwargs):
-        try:
-            file = File.objects.get(pk=kwargs["pk"])
-        except File.DoesNotExist:
+        downloads = (
+            File.objects.filter(pk=kwargs["pk"])
+            .values_list("downloads", flat=True)
+            .first()
+        )
+        if downloads is None:
             return Response(
                 {"detail": "File not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        if "downloads" in request.data and request.data["downloads"] == "increment":
-            updated = File.objects.filter(pk=kwargs["pk"]).update(
-                downloads=F("downloads") + 1
+        if request.data.get("downloads") != "increment":
+            return Response(
+                {"detail": "Invalid request body"}, status=status.HTTP_400_BAD_REQUEST
             )
-            if updated == 0:
-                return Response(
-                    {"detail": "File not found or update failed"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            file.refresh_from_db()
-            return Response({"downloads": file.downloads}, status=status.HTTP_200_OK)
 
+        # Written in bulk by a background thread, see mousetube_api.buffers.
+        # The returned count is an estimate: the stored counter plus this
+        # download, without the downloads still buffered by any worker.
+        count_download(kwargs["pk"])
+        return Response({"downloads": downloads + 1}, status=status.HTTP_200_OK)
+
+
+class FileDownloadAPIView(APIView):
+    @extend_schema(responses={302: None, 404: None})
+    def get(self, request, *args, **kwargs):
+        """
+        Count a download of the file and redirect to its link.
+        """
+        links = File.objects.filter(pk=kwargs["pk"]).values_list("link", flat=True)
+        link = get_object_or_404(links)
+        if not link:
+            raise Http404("File has no link")
+        response = redirect(link)
+        if request.method == "GET":
+            count_download(kwargs["pk"])
+        # Every download must reach the server to be counted
+        add_never_cache_headers(response)
+        return response
+
+
+class FileDownloadsAPIView(APIView):
+    serializer_class = FileDownloadsSerializer
+
+    @extend_schema(request=FileDownloadsSerializer, responses={202: None})
+    def post(self, request):
+        """
+        Count downloads of several files at once, e.g. prefetched ones.
+        """
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        for pk, count in Counter(serializer.validated_data["files"]).items():
+            count_download(pk, count)
+        return Response(
+            {"files": len(serializer.validated_data["files"])},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class DownloadSeriesAPIView(APIView):
+    """
+    Downloads over time of a file, dataset or species, set by ``scope``.
+    """
+
+    scope = "file"
+    cache_models = (FileDownload, File, Dataset, Species)
+
+    @extend_schema(parameters=[DownloadSeriesSerializer])
+    @conditional_response
+    @cache_response()
+    def get(self, request, pk, *args, **kwargs):
+        params = DownloadSeriesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        model, _ = DOWNLOAD_SCOPES[self.scope]
+        get_object_or_404(model.objects.only("pk"), pk=pk)
+        series = download_series(self.scope, pk, **params.validated_data)
         return Response(
-            {"detail": "Invalid request body"}, status=status.HTTP_400_BAD_REQUEST
+            {
+                "id": pk,
+                "period": params.validated_data["period"],
+                "total": sum(item["count"] for item in series),
+                "series": series,
+            }
         )
 
 
@@ -271,12 +398,30 @@ class SoftwareAPIView(APIView):
             OpenApiParameter(
                 name="filter", description="filter", required=False, type=str
             ),
+            OpenApiParameter(
+                name="pagination",
+                description="set to 'cursor' to use keyset pagination",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="cursor",
+                description="keyset pagination cursor",
+                required=False,
+                type=str,
+            ),
+            *SPARSE_FIELDSET_PARAMETERS,
         ]
     )
+    @conditional_response
+    @cache_response(first_page_only=True)
     def get(self, request, *args, **kwargs):
         search_query = request.GET.get("search", "")
         filter_query = request.GET.get("filter", "")
-        softwares = Software.objects.all()
+        fieldset = sparse_fieldset(request.query_params)
+        softwares = eager_load(
+            Software.objects.all(), self.serializer_class(**fieldset)
+        )
 
         if search_query:
             software_fields = [
@@ -330,9 +475,9 @@ class SoftwareAPIView(APIView):
             softwares = softwares.filter(type=filter_query)
 
         softwares = softwares.order_by("name")
-        paginator = FilePagination()
+        paginator = get_paginator(request)
         paginated_softwares = paginator.paginate_queryset(softwares, request)
-        serializer = self.serializer_class(paginated_softwares, many=True)
+        serializer = self.serializer_class(paginated_softwares, many=True, **fieldset)
         return paginator.get_paginated_response(serializer.data)
 
 
@@ -347,20 +492,43 @@ class TrackPageView(APIView):
 
         today = now().date()
 
-        obj, created = PageView.objects.get_or_create(
-            path=path, date=today, defaults={"count": 1}
-        )
+        # Views are aggregated in memory and written in bulk by a background
+        # thread, see mousetube_api.buffers
+        page_views.add((path, today))
 
-        if not created:
-            PageView.objects.filter(pk=obj.pk).update(count=F("count") + 1)
+        schedule_page_view_report()
 
-        cache_key = f"pageview-log-generated-{today}"
+        return Response({"path": path, "date": today}, status=status.HTTP_202_ACCEPTED)
 
-        if not cache.get(cache_key):
-            call_command("export_page_view", verbosity=0)
-            cache.set(cache_key, True, 60 * 60 * 24)
 
-        return Response(PageViewSerializer(obj).data, status=status.HTTP_200_OK)
+def client_ip(request):
+    """
+    Return the address of the client, the one set by the proxy in X-Real-IP
+    when ``METRICS_TRUST_X_REAL_IP`` says the header can be trusted.
+    """
+    if settings.METRICS_TRUST_X_REAL_IP and "HTTP_X_REAL_IP" in request.META:
+        return request.META["HTTP_X_REAL_IP"]
+    return request.META.get("REMOTE_ADDR")
+
+
+def can_read_metrics(request):
+    return request.user.is_staff or client_ip(request) in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+def request_histograms_view(request):
+    """
+    Serve the ``REQUEST_INSTRUMENTATION`` histograms of the worker process
+    answering the request, keyed by URL name.
+    """
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+    return JsonResponse({"pid": os.getpid(), "views": request_histograms()})
 
 
 def stats_view(request):
@@ -381,38 +549,86 @@ def stats_view(request):
 # Dataset
 # ----------------------------
 class DatasetAPIView(APIView):
-    serializer_class = DatasetSerializer
+    serializer_class = DatasetSummarySerializer
+    # The summaries also count the files, strains and laboratories
+    cache_models = (Dataset, Species, File, Subject, Strain, Experiment)
 
     @extend_schema(
         parameters=[
+            DatasetFilterSerializer,
             OpenApiParameter(
                 name="search", description="text search", required=False, type=str
             ),
             OpenApiParameter(
-                name="filter", description="filter", required=False, type=str
+                name="filter",
+                description="search a single field: name, description, species or metadata",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="pagination",
+                description="set to 'cursor' to use keyset pagination",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="cursor",
+                description="keyset pagination cursor",
+                required=False,
+                type=str,
             ),
+            *SPARSE_FIELDSET_PARAMETERS,
         ]
     )
+    @conditional_response
+    @cache_response(first_page_only=True)
     def get(self, request, *args, **kwargs):
-        search_query = request.GET.get("search", "")
-        filter_query = request.GET.get("filter", "")
-        dataset = Dataset.objects.all()
-
-        if search_query:
-            dataset_fields = ["name", "species", "description"]
+        fieldset = sparse_fieldset(request.query_params)
+        summary = self.serializer_class(**fieldset)
+        dataset = eager_load(Dataset.objects.all(), summary)
+        if {"file_count", "total_downloads"} & summary.fields.keys():
+            dataset = annotate_dataset_summaries(dataset)
+        dataset = filter_datasets(dataset, request.GET)
 
-            # Build Q objects
-            dataset_query = Q()
-            for field in dataset_fields:
-                dataset_query |= Q(**{f"{field}__icontains": search_query})
+        datasets = dataset.order_by("name")
+        paginator = get_paginator(request)
+        paginated_datasets = paginator.paginate_queryset(datasets, request)
+        if "facets" in summary.fields:
+            attach_dataset_facets(paginated_datasets)
+        serializer = self.serializer_class(paginated_datasets, many=True, **fieldset)
+        return paginator.get_paginated_response(serializer.data)
 
-        ALLOWED_FILTERS = ["name", "species", "description"]
 
-        if filter_query and filter_query in ALLOWED_FILTERS:
-            dataset = dataset.filter(type=filter_query)
+class DatasetFilesAPIView(APIView):
+    serializer_class = FileSerializer
+    cache_models = (Dataset, File, Experiment, Protocol, User, Subject, Strain, Species)
 
-        datasets = dataset.order_by("name")
-        paginator = FilePagination()
-        paginated_datasets = paginator.paginate_queryset(datasets, request)
-        serializer = self.serializer_class(paginated_datasets, many=True)
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="pagination",
+                description="set to 'cursor' to use keyset pagination",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="cursor",
+                description="keyset pagination cursor",
+                required=False,
+                type=str,
+            ),
+            *SPARSE_FIELDSET_PARAMETERS,
+        ]
+    )
+    @conditional_response
+    @cache_response(first_page_only=True)
+    def get(self, request, pk, *args, **kwargs):
+        dataset = get_object_or_404(Dataset.objects.only("pk"), pk=pk)
+        fieldset = sparse_fieldset(request.query_params)
+        files = eager_load(
+            dataset.files.all(), self.serializer_class(**fieldset)
+        ).order_by(F("name").asc(nulls_last=True), "pk")
+        paginator = get_paginator(request)
+        paginated_files = paginator.paginate_queryset(files, request)
+        serializer = self.serializer_class(paginated_files, many=True, **fieldset)
         return paginator.get_paginated_response(serializer.data)
@@ -138,7 +138,7 @@ if [ -f "$FIXTURE_FILE" ]; then
 
     if [ "$ROW_COUNT" -eq 0 ]; then
         echo "📥 Table is empty. Loading fixture from $FIXTURE_FILE..."
-        python3 manage.py loaddata "$FIXTURE_FILE"
+        python3 manage.py import_data "$FIXTURE_FILE"
     else
         echo "✅ Table already contains $ROW_COUNT rows. Skipping fixture loading."
     fi
@@ -155,8 +155,13 @@ fi
 # Run server
 if [ "$DEPLOY" == "true" ]; then
     if [ "$DEBUG" == "false" ]; then
+        if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+            # Metrics of the previous server run
+            rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+            mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+        fi
         echo "🚀 Starting Gunicorn server..."
-        exec gunicorn mousetube_api.asgi:application --bind 0.0.0.0:8000 --timeout 420 -k uvicorn.workers.UvicornWorker
+        exec gunicorn mousetube_api.asgi:application -c python:mousetube_api.gunicorn_conf --bind 0.0.0.0:8000 --timeout 420 -k uvicorn.workers.UvicornWorker
     else
         echo "⚙️ Starting development server..."
         exec python3 manage.py runserver 0.0.0.0:8000
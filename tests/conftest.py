@@ -0,0 +1,127 @@
+from datetime import date
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+
+from mousetube_api.models import (
+    Dataset,
+    Experiment,
+    File,
+    Protocol,
+    Reference,
+    Software,
+    Species,
+    Strain,
+    Subject,
+    User,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Cached responses and model versions must not leak between tests
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def make_catalog(size, offset=0):
+    """
+    Create ``size`` rows of every catalog model, linked to each other.
+
+    Args:
+        size (int): Number of rows per model.
+        offset (int): First number of the generated names, to call it again
+            on the same database.
+
+    Returns:
+        dict: The created rows, keyed by model name.
+    """
+    species = Species.objects.get_or_create(name="Mus musculus")[0]
+    reference = Reference.objects.get_or_create(name="ref", url="https://x.org")[0]
+    rows = {
+        name: []
+        for name in (
+            "users",
+            "strains",
+            "subjects",
+            "protocols",
+            "experiments",
+            "files",
+            "softwares",
+            "datasets",
+        )
+    }
+    for i in range(offset, offset + size):
+        user = User.objects.create(
+            name_user=f"Doe{i}",
+            first_name_user=f"John{i}",
+            email_user=f"john{i}@example.org",
+            unit_user="U",
+            institution_user="IGBMC",
+            country_user="France",
+        )
+        strain = Strain.objects.create(name=f"C57BL/{i}", background="B6")
+        subject = Subject.objects.create(
+            name=f"subject{i}",
+            strain=strain,
+            user=user,
+            sex="male" if i % 2 else "female",
+        )
+        protocol = Protocol.objects.create(
+            name=f"protocol{i}", description="description", user=user
+        )
+        experiment = Experiment.objects.create(
+            name=f"experiment{i}",
+            protocol=protocol,
+            date=date(2024, 1, 1 + i % 28),
+            sampling_rate=250000.0,
+            laboratory=f"lab{i % 2}",
+        )
+        file = File.objects.create(
+            name=f"file{i:03d}",
+            experiment=experiment,
+            subject=subject,
+            number=i,
+            link=f"https://example.org/file{i}.wav",
+            is_valid_link=bool(i % 2),
+            species=species,
+        )
+        software = Software.objects.create(name=f"software{i}", type="analysis")
+        software.users.set([user])
+        software.references.set([reference])
+        dataset = Dataset.objects.create(
+            name=f"dataset{i}", created_by=user, species=species, metadata={"i": i}
+        )
+        dataset.files.set([file])
+        for name, row in zip(
+            rows,
+            (user, strain, subject, protocol, experiment, file, software, dataset),
+            strict=True,
+        ):
+            rows[name].append(row)
+    return rows
+
+
+@pytest.fixture
+def catalog(db):
+    return make_catalog
+
+
+@pytest.fixture
+def asgi_get():
+    """
+    Return a function getting a URL through ``AsyncClient``, which checks the
+    response streams asynchronously and returns it with its read body.
+    """
+
+    @async_to_sync
+    async def get(url):
+        response = await AsyncClient().get(url)
+        assert response.is_async
+        body = b"".join([piece async for piece in response.streaming_content])
+        return response, body
+
+    return get
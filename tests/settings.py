@@ -0,0 +1,18 @@
+# Settings of the test suite: an in-memory SQLite database, tables created
+# from the models (migrations are generated at deployment).
+
+from mousetube_api.settings import *
+
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+MIGRATION_MODULES = {"mousetube_api": None}
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+DEBUG = False
+SECURE_SSL_REDIRECT = False
+ALLOWED_HOSTS = ["*"]
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+# The dead link checks must not write to the deployment's log files
+LOGGING["handlers"].update(
+    dead_links_info_file={"class": "logging.NullHandler"},
+    dead_links_error_file={"class": "logging.NullHandler"},
+)
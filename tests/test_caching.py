@@ -0,0 +1,67 @@
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mousetube_api.buffers import count_download, file_downloads
+from mousetube_api.models import ModelChange, User
+
+
+def test_download_flush_invalidates_cache_and_etag(client, catalog):
+    file = catalog(1)["files"][0]
+    url = reverse("file-list")
+    response = client.get(url)
+    etag = response["ETag"]
+    assert response.json()["results"][0]["downloads"] == file.downloads
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    count_download(file.pk, 3)
+    file_downloads.flush()
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+    assert response.json()["results"][0]["downloads"] == file.downloads + 3
+
+
+def test_download_flush_invalidates_dataset_totals(client, catalog):
+    file = catalog(1)["files"][0]
+    url = reverse("dataset-list")
+    etag = client.get(url)["ETag"]
+
+    count_download(file.pk, 2)
+    file_downloads.flush()
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_change_recorded_by_another_process_invalidates_cache(client, catalog):
+    user = catalog(1)["users"][0]
+    url = reverse("user-list")
+    assert client.get(url).json()[0]["name_user"] == user.name_user
+
+    # What touch() does in a management command: only the database changes,
+    # not the cache of this process
+    User.objects.filter(pk=user.pk).update(name_user="Renamed")
+    ModelChange.objects.filter(model="mousetube_api.user").update(
+        version=F("version") + 1
+    )
+
+    assert client.get(url).json()[0]["name_user"] == "Renamed"
+
+
+def test_cache_hit_reads_the_versions_once(client, catalog):
+    catalog(1)
+    url = reverse("user-list")
+    ModelChange.objects.all().delete()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert not [q for q in queries if not q["sql"].startswith("SELECT")]
+    assert "Last-Modified" not in response
+
+    with CaptureQueriesContext(connection) as queries:
+        hit = client.get(url)
+    assert len(queries) == 1
+    assert "mousetube_api_modelchange" in queries[0]["sql"]
+    assert hit["ETag"] == response["ETag"]
+    assert hit.json() == response.json()
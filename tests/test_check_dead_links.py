@@ -0,0 +1,173 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import pairwise
+
+import pytest
+from django.core.management import call_command
+
+from mousetube_api.models import File, LinkCheck
+
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answer by path: ``/ok`` with an ETag, ``/slow`` after a pause,
+    ``/limited`` with a 429 then a 200, and anything else with a 404.
+    """
+
+    def do_HEAD(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(
+                (self.command, self.path, self.headers, time.monotonic())
+            )
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            limited = self.path.startswith("/limited") and self.path not in server.seen
+            server.seen.add(self.path)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(0.2)
+                self.answer(200)
+            elif self.path.startswith("/ok"):
+                if self.headers.get("If-None-Match") == ETAG:
+                    self.answer(304)
+                else:
+                    self.answer(200, ETag=ETAG)
+            elif limited:
+                self.answer(429, **{"Retry-After": "1"})
+            elif self.path.startswith("/limited"):
+                self.answer(200)
+            else:
+                self.answer(404)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    do_GET = do_HEAD
+
+    def answer(self, status, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(host):
+    try:
+        server = ThreadingHTTPServer((host, 0), StubHandler)
+    except OSError:
+        pytest.skip(f"cannot listen on {host}")
+    server.lock = threading.Lock()
+    server.requests = []
+    server.seen = set()
+    server.active = server.max_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def stubs():
+    # Links to localhost and 127.0.0.1 are skipped by the command: the stubs
+    # listen on other loopback addresses, one per host.
+    servers = [start_stub("127.0.0.2"), start_stub("127.0.0.3")]
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def url(server, path):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{path}"
+
+
+def make_files(*links):
+    return [File.objects.create(link=link) for link in links]
+
+
+def check(**options):
+    call_command("check_dead_links", **{"delay": 0, **options})
+
+
+def test_concurrency_is_capped(db, stubs):
+    make_files(*(url(stubs[0], f"/slow/{i}") for i in range(6)))
+    check(concurrency=2)
+    assert len(stubs[0].requests) == 6
+    assert stubs[0].max_active == 2
+
+
+def test_requests_are_spaced_per_host(db, stubs):
+    make_files(
+        *(url(server, f"/ok/{i}") for server in stubs for i in range(3)),
+    )
+    check(concurrency=6, delay=0.3)
+
+    starts = {}
+    for server in stubs:
+        times = [at for _, _, _, at in server.requests]
+        assert len(times) == 3
+        assert all(b - a >= 0.25 for a, b in pairwise(times))
+        starts[server] = times[0]
+    # Hosts are not delayed by each other
+    assert abs(starts[stubs[0]] - starts[stubs[1]]) < 0.2
+
+
+def test_rate_limited_link_is_retried_after_retry_after(db, stubs):
+    [file] = make_files(url(stubs[0], "/limited"))
+    check(max_retries=1)
+
+    times = [at for _, _, _, at in stubs[0].requests]
+    assert len(times) == 2
+    assert times[1] - times[0] >= 0.9
+    assert LinkCheck.objects.get(file=file).status_code == 200
+    assert File.objects.get(pk=file.pk).is_valid_link
+
+
+def test_unchanged_link_answers_304_on_recheck(db, stubs):
+    [file] = make_files(url(stubs[0], "/ok"))
+    check()
+    first = LinkCheck.objects.get(file=file)
+    assert (first.status_code, first.etag) == (200, ETAG)
+
+    check()
+    _, _, headers, _ = stubs[0].requests[-1]
+    assert headers["If-None-Match"] == ETAG
+    second = LinkCheck.objects.get(file=file)
+    assert (second.status_code, second.etag) == (304, ETAG)
+    assert second.checked_at > first.checked_at
+    assert File.objects.get(pk=file.pk).is_valid_link
+
+
+def test_link_check_history(db, stubs):
+    # Nothing listens on a port freed right after binding it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.2", 0))
+        closed_url = f"http://127.0.0.2:{sock.getsockname()[1]}/ok"
+    ok, missing, unreachable = make_files(
+        url(stubs[0], "/ok"), url(stubs[0], "/missing"), closed_url
+    )
+    check()
+
+    checks = {check.file_id: check for check in LinkCheck.objects.all()}
+    assert checks[ok.pk].status_code == 200
+    assert checks[missing.pk].status_code == 404
+    assert checks[unreachable.pk].status_code is None
+    assert checks[unreachable.pk].error
+    valid = dict(File.objects.values_list("pk", "is_valid_link"))
+    assert valid == {ok.pk: True, missing.pk: False, unreachable.pk: False}
+
+    # Recently checked valid links are skipped, failing ones checked again
+    requests = len(stubs[0].requests)
+    check(recheck_after=1)
+    assert [path for _, path, _, _ in stubs[0].requests[requests:]] == [
+        "/missing",
+        "/missing",
+    ]
@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from mousetube_api.management.commands import rollup_downloads
+from mousetube_api.models import DownloadEvent, FileDownload
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollup_downloads, "LOGS_DIR", str(tmp_path))
+
+
+def record(file, day, count=1):
+    DownloadEvent.objects.create(file=file, date=day, count=count)
+
+
+def rollups():
+    return set(
+        FileDownload.objects.values_list("file_id", "species_id", "date", "count")
+    )
+
+
+def test_rollup_adds_events_to_daily_counts_and_deletes_them(catalog):
+    first, second = catalog(2)["files"]
+    record(first, date(2026, 3, 1), 2)
+    record(first, date(2026, 3, 1))
+    record(second, date(2026, 3, 2))
+    call_command("rollup_downloads", verbosity=0)
+
+    assert not DownloadEvent.objects.exists()
+    species = first.species_id
+    assert rollups() == {
+        (first.pk, species, date(2026, 3, 1), 3),
+        (second.pk, species, date(2026, 3, 2), 1),
+    }
+
+    # Events recorded since the last run are added to the stored counts
+    record(first, date(2026, 3, 1))
+    call_command("rollup_downloads", verbosity=0)
+    assert (first.pk, species, date(2026, 3, 1), 4) in rollups()
+
+
+def test_rollup_is_idempotent(catalog):
+    file = catalog(1)["files"][0]
+    record(file, date(2026, 3, 1), 5)
+    call_command("rollup_downloads", verbosity=0)
+    expected = rollups()
+
+    call_command("rollup_downloads", verbosity=0)
+    assert rollups() == expected
+    assert not DownloadEvent.objects.exists()
+
+
+@pytest.fixture
+def files(catalog):
+    files = catalog(3)["files"]
+    for file, day, count in (
+        (files[0], date(2026, 2, 27), 1),
+        (files[0], date(2026, 3, 1), 2),
+        (files[1], date(2026, 3, 1), 4),
+        (files[2], date(2026, 3, 2), 8),
+    ):
+        record(file, day, count)
+    call_command("rollup_downloads", verbosity=0)
+    return files
+
+
+def series(client, name, pk, query=""):
+    response = client.get(reverse(name, args=[pk]) + query)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == pk
+    assert body["total"] == sum(item["count"] for item in body["series"])
+    return [[item["date"], item["count"]] for item in body["series"]]
+
+
+def test_file_series(client, files):
+    assert series(client, "file-downloads-series", files[0].pk) == [
+        ["2026-02-27", 1],
+        ["2026-03-01", 2],
+    ]
+    assert series(client, "file-downloads-series", files[0].pk, "?period=month") == [
+        ["2026-02-01", 1],
+        ["2026-03-01", 2],
+    ]
+    assert series(
+        client, "file-downloads-series", files[0].pk, "?start=2026-03-01"
+    ) == [["2026-03-01", 2]]
+
+
+def test_dataset_series_sums_its_files(client, files):
+    dataset = files[1].files.get()
+    assert series(client, "dataset-downloads", dataset.pk) == [["2026-03-01", 4]]
+
+
+def test_species_series_sums_its_files(client, files):
+    assert series(client, "species-downloads", files[0].species_id) == [
+        ["2026-02-27", 1],
+        ["2026-03-01", 6],
+        ["2026-03-02", 8],
+    ]
+    assert series(
+        client, "species-downloads", files[0].species_id, "?end=2026-03-01"
+    ) == [["2026-02-27", 1], ["2026-03-01", 6]]
+
+
+@pytest.mark.parametrize(
+    "name", ["file-downloads-series", "dataset-downloads", "species-downloads"]
+)
+def test_series_of_unknown_object_is_not_found(client, files, name):
+    assert client.get(reverse(name, args=[1000])).status_code == 404
+
+
+def test_series_rejects_invalid_parameters(client, files):
+    url = reverse("file-downloads-series", args=[files[0].pk])
+    assert client.get(url + "?period=week").status_code == 400
+    assert client.get(url + "?start=yesterday").status_code == 400
@@ -0,0 +1,77 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from mousetube_api.buffers import file_downloads
+from mousetube_api.models import DownloadEvent, File
+
+
+@pytest.fixture
+def file(catalog):
+    yield catalog(1)["files"][0]
+    file_downloads.flush()
+
+
+def patch(client, pk, data):
+    return client.patch(
+        reverse("file-detail", args=[pk]), data, content_type="application/json"
+    )
+
+
+def test_increment_returns_estimate_and_buffers_count(client, file):
+    response = patch(client, file.pk, {"downloads": "increment"})
+    assert response.status_code == 200
+    assert response.json() == {"downloads": file.downloads + 1}
+
+    file_downloads.flush()
+    assert File.objects.get(pk=file.pk).downloads == file.downloads + 1
+
+
+def test_unknown_file_is_checked_before_body(client, file):
+    assert patch(client, file.pk + 1000, {"downloads": "x"}).status_code == 404
+    assert patch(client, file.pk, {"downloads": "x"}).status_code == 400
+
+
+def test_download_redirects_to_link_and_records_event(client, file):
+    response = client.get(reverse("file-download", args=[file.pk]))
+    assert response.status_code == 302
+    assert response["Location"] == file.link
+    assert "no-cache" in response["Cache-Control"]
+
+    file_downloads.flush()
+    assert list(DownloadEvent.objects.values_list("file_id", "date", "count")) == [
+        (file.pk, timezone.now().date(), 1)
+    ]
+    assert File.objects.get(pk=file.pk).downloads == file.downloads + 1
+
+
+def test_download_of_unknown_file_is_not_found(client, file):
+    response = client.get(reverse("file-download", args=[file.pk + 1000]))
+    assert response.status_code == 404
+    file_downloads.flush()
+    assert not DownloadEvent.objects.exists()
+
+
+def test_batch_downloads_are_counted_per_file(client, catalog):
+    first, second = catalog(2)["files"]
+    response = client.post(
+        reverse("file-downloads"),
+        {"files": [first.pk, second.pk, first.pk]},
+        content_type="application/json",
+    )
+    assert response.status_code == 202
+    assert response.json() == {"files": 3}
+
+    file_downloads.flush()
+    assert dict(DownloadEvent.objects.values_list("file_id", "count")) == {
+        first.pk: 2,
+        second.pk: 1,
+    }
+
+
+@pytest.mark.parametrize("files", [[], ["x"], [0]])
+def test_batch_downloads_reject_invalid_ids(client, files):
+    response = client.post(
+        reverse("file-downloads"), {"files": files}, content_type="application/json"
+    )
+    assert response.status_code == 400
@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+import pytest
+from django.urls import reverse
+
+from mousetube_api.exports import FILE_EXPORT_COLUMNS, export_files
+from mousetube_api.models import File
+
+
+def test_ndjson_export_is_async_under_asgi(asgi_get, catalog):
+    files = catalog(3)["files"]
+    response, body = asgi_get(reverse("file-export"))
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [row["id"] for row in rows] == sorted(file.pk for file in files)
+
+
+def test_csv_export_is_async_under_asgi(asgi_get, catalog):
+    catalog(3)
+    response, body = asgi_get(reverse("file-export") + "?output=csv")
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert rows[0] == list(FILE_EXPORT_COLUMNS)
+    assert len(rows) == 4
+
+
+def test_export_reads_files_in_chunks(catalog):
+    catalog(5)
+    pieces = list(export_files(File.objects.all(), "ndjson", chunk_size=2))
+    assert [piece.count(b"\n") for piece in pieces] == [2, 2, 1]
+
+
+def test_parquet_export_writes_one_row_group_per_chunk(catalog):
+    pq = pytest.importorskip("pyarrow.parquet")
+    catalog(5)
+    body = b"".join(export_files(File.objects.all(), "parquet", chunk_size=2))
+    assert pq.ParquetFile(io.BytesIO(body)).num_row_groups == 3
@@ -0,0 +1,44 @@
+from django.urls import reverse
+
+URL = reverse("file-facets")
+
+
+def test_facets_count_files_per_value(client, catalog):
+    rows = catalog(3)
+    body = client.get(URL).json()
+    assert body["count"] == 3
+    facets = body["facets"]
+    assert facets["sex"] == [
+        {"value": "female", "count": 2},
+        {"value": "male", "count": 1},
+    ]
+    assert facets["laboratory"] == [
+        {"value": "lab0", "count": 2},
+        {"value": "lab1", "count": 1},
+    ]
+    species = rows["files"][0].species
+    assert facets["species"] == [
+        {"value": species.pk, "label": species.name, "count": 3}
+    ]
+    assert {item["label"] for item in facets["strain"]} == {
+        strain.name for strain in rows["strains"]
+    }
+
+
+def test_facets_follow_filters(client, catalog):
+    catalog(3)
+    body = client.get(URL + "?sex=male").json()
+    assert body["count"] == 1
+    assert body["facets"]["sex"] == [{"value": "male", "count": 1}]
+
+
+def test_search_facets_are_invalidated_by_related_changes(client, catalog):
+    user = catalog(2)["users"][0]
+    url = f"{URL}?search=Renamed"
+    assert client.get(url).json()["count"] == 0
+
+    user.name_user = "Renamed"
+    user.save()
+
+    assert client.get(url).json()["count"] == 1
+    assert client.get(reverse("file-list") + "?search=Renamed").json()["count"] == 1
@@ -0,0 +1,37 @@
+import pytest
+from django.urls import reverse
+
+
+@pytest.mark.parametrize(
+    "params, errors",
+    [
+        (
+            "fields=id,nope,experiment.protocol.nope",
+            {"fields": ["Unknown fields: nope, experiment.protocol.nope."]},
+        ),
+        ("fields=name.first", {"fields": ["Unknown fields: name.first."]}),
+        (
+            "expand=name,subject.nope",
+            {"expand": ["Unknown fields: name, subject.nope."]},
+        ),
+    ],
+)
+def test_unknown_paths_are_rejected(client, catalog, params, errors):
+    catalog(1)
+    response = client.get(f"{reverse('file-list')}?{params}")
+    assert response.status_code == 400
+    assert response.json() == errors
+
+
+def test_known_paths_are_rendered(client, catalog):
+    catalog(1)
+    response = client.get(
+        f"{reverse('file-list')}?fields=id,experiment.protocol.name,subject"
+        "&expand=experiment.protocol"
+    )
+    assert response.status_code == 200
+    [row] = response.json()["results"]
+    assert set(row) == {"id", "experiment", "subject"}
+    assert set(row["experiment"]) == {"protocol"}
+    assert set(row["experiment"]["protocol"]) == {"name"}
+    assert isinstance(row["subject"], int)
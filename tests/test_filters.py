@@ -0,0 +1,116 @@
+from datetime import UTC, datetime
+
+import pytest
+from django.urls import reverse
+
+from mousetube_api.models import Dataset, Experiment, File, Species
+
+
+def names(client, name, query):
+    response = client.get(reverse(name) + query)
+    assert response.status_code == 200, response.content
+    return sorted(row["name"] for row in response.json()["results"])
+
+
+@pytest.fixture
+def datasets(catalog):
+    datasets = catalog(3)["datasets"]
+    rat = Species.objects.create(name="Rattus norvegicus")
+    Dataset.objects.filter(pk=datasets[2].pk).update(species=rat)
+    for i, dataset in enumerate(datasets):
+        Dataset.objects.filter(pk=dataset.pk).update(
+            created_at=datetime(2026, 3, 1 + i, 23, 30, tzinfo=UTC)
+        )
+    return datasets
+
+
+def test_datasets_by_species(client, datasets):
+    species = datasets[0].species_id
+    assert names(client, "dataset-list", f"?species={species}") == [
+        "dataset0",
+        "dataset1",
+    ]
+
+
+def test_datasets_by_creation_date(client, datasets):
+    # Both bounds include the whole day
+    assert names(client, "dataset-list", "?created_after=2026-03-02") == [
+        "dataset1",
+        "dataset2",
+    ]
+    assert names(client, "dataset-list", "?created_before=2026-03-02") == [
+        "dataset0",
+        "dataset1",
+    ]
+    assert names(
+        client, "dataset-list", "?created_after=2026-03-02&created_before=2026-03-02"
+    ) == ["dataset1"]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "?species=rat",
+        "?species=0",
+        "?created_after=2026-13-01",
+        "?created_before=yesterday",
+    ],
+)
+def test_invalid_dataset_filters_are_rejected(client, datasets, query):
+    response = client.get(reverse("dataset-list") + query)
+    assert response.status_code == 400
+    assert response.json().keys() == {query[1:].split("=")[0]}
+
+
+@pytest.fixture
+def files(catalog):
+    rows = catalog(4)
+    for i, experiment in enumerate(rows["experiments"]):
+        Experiment.objects.filter(pk=experiment.pk).update(
+            sampling_rate=100000.0 * (i + 1)
+        )
+    # An empty name is stored when the image is cleared
+    File.objects.filter(pk=rows["files"][0].pk).update(spectrogram="spec0.png")
+    File.objects.filter(pk=rows["files"][1].pk).update(spectrogram="")
+    return rows["files"]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("?sex=male", ["file001", "file003"]),
+        ("?sex=female", ["file000", "file002"]),
+        ("?laboratory=lab0", ["file000", "file002"]),
+        ("?laboratory=lab2", []),
+        ("?date_after=2024-01-03", ["file002", "file003"]),
+        ("?date_before=2024-01-02", ["file000", "file001"]),
+        ("?date_after=2024-01-02&date_before=2024-01-03", ["file001", "file002"]),
+        ("?sampling_rate_min=300000", ["file002", "file003"]),
+        ("?sampling_rate_max=200000", ["file000", "file001"]),
+        ("?sampling_rate_min=200000&sampling_rate_max=300000", ["file001", "file002"]),
+        ("?has_spectrogram=true", ["file000"]),
+        ("?has_spectrogram=false", ["file001", "file002", "file003"]),
+        ("?sex=male&laboratory=lab1&date_after=2024-01-04", ["file003"]),
+    ],
+)
+def test_typed_file_filters(client, files, query, expected):
+    assert names(client, "file-list", query) == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "?sex=other",
+        "?laboratory=" + "x" * 256,
+        "?date_after=2024-02-30",
+        "?date_before=soon",
+        "?sampling_rate_min=fast",
+        "?sampling_rate_max=high",
+        "?has_spectrogram=maybe",
+    ],
+)
+def test_invalid_file_filters_are_rejected(client, files, query):
+    for name in ("file-list", "file-facets"):
+        response = client.get(reverse(name) + query)
+        assert response.status_code == 400
+        assert response.json().keys() == {query[1:].split("=")[0]}
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from mousetube_api.dumps import CATALOG_MODELS
+from mousetube_api.models import FileSearch
+
+
+def snapshot():
+    """
+    Return every catalog row with its foreign keys and many-to-many rows, and
+    the file search documents.
+    """
+    rows = {}
+    for model in CATALOG_MODELS:
+        fields = [field.attname for field in model._meta.concrete_fields]
+        rows[model._meta.label] = [
+            tuple(map(to_json_precision, row))
+            for row in model._base_manager.order_by("pk").values_list(*fields)
+        ]
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            columns = (
+                f"{field.m2m_field_name()}_id",
+                f"{field.m2m_reverse_field_name()}_id",
+            )
+            rows[through._meta.label] = sorted(
+                through._base_manager.values_list(*columns)
+            )
+    rows["documents"] = list(
+        FileSearch.objects.order_by("file_id").values_list("file_id", "document")
+    )
+    return rows
+
+
+def to_json_precision(value):
+    # DjangoJSONEncoder writes datetimes to the millisecond, like dumpdata
+    if isinstance(value, datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+
+def index_names(model):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return {name for name, info in constraints.items() if info["index"]}
+
+
+@pytest.mark.parametrize(
+    "defer_indexes",
+    [
+        False,
+        # SQLite cannot alter the schema inside the test transaction
+        pytest.param(True, marks=pytest.mark.django_db(transaction=True)),
+    ],
+)
+def test_export_then_import_restores_the_catalog(catalog, tmp_path, defer_indexes):
+    catalog(4)
+    before = snapshot()
+    assert all(before.values())
+    path = str(tmp_path / "catalog.json.gz")
+    call_command("export_data", output=path, chunk_size=3, verbosity=0)
+
+    for model in reversed(CATALOG_MODELS):
+        model._base_manager.all().delete()
+    assert not FileSearch.objects.exists()
+
+    call_command(
+        "import_data", path, batch_size=5, defer_indexes=defer_indexes, verbosity=0
+    )
+
+    assert snapshot() == before
+    for model in CATALOG_MODELS:
+        assert {index.name for index in model._meta.indexes} <= index_names(model)
@@ -0,0 +1,55 @@
+import pytest
+from django.urls import reverse
+
+
+@pytest.fixture
+def allowed(settings):
+    settings.METRICS_ALLOWED_IPS = ["10.0.0.5"]
+    return settings
+
+
+def test_allowed_address_gets_metrics(client, allowed):
+    response = client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.5")
+    assert response.status_code == 200
+    assert b"mousetube_request_duration_seconds" in response.content
+
+
+def test_x_real_ip_is_ignored_by_default(client, allowed):
+    response = client.get(
+        reverse("metrics"), REMOTE_ADDR="10.0.0.1", HTTP_X_REAL_IP="10.0.0.5"
+    )
+    assert response.status_code == 403
+
+
+def test_x_real_ip_is_checked_behind_a_trusted_proxy(client, allowed):
+    allowed.METRICS_TRUST_X_REAL_IP = True
+    url = reverse("metrics")
+    assert (
+        client.get(url, REMOTE_ADDR="10.0.0.1", HTTP_X_REAL_IP="10.0.0.5").status_code
+        == 200
+    )
+    # The proxy address itself is not allowed
+    assert (
+        client.get(url, REMOTE_ADDR="10.0.0.5", HTTP_X_REAL_IP="10.0.0.1").status_code
+        == 403
+    )
+
+
+def test_request_histograms_are_served(client, allowed, catalog):
+    allowed.REQUEST_INSTRUMENTATION = True
+    catalog(1)
+    client.get(reverse("user-list"))
+
+    url = reverse("request-histograms")
+    assert client.get(url, REMOTE_ADDR="10.0.0.1").status_code == 403
+    response = client.get(url, REMOTE_ADDR="10.0.0.5")
+    assert response.status_code == 200
+    histograms = response.json()["views"]["user-list"]
+    assert histograms["queries"]["count"] >= 1
+    assert set(histograms) == {
+        "total_ms",
+        "db_ms",
+        "serialize_ms",
+        "render_ms",
+        "queries",
+    }
@@ -0,0 +1,73 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db.models import F
+
+from mousetube_api.management.commands.export_page_view import Command
+from mousetube_api.models import PageView
+
+
+def test_report_is_built_from_rollups_only(db):
+    PageView.objects.bulk_create(
+        [
+            PageView(path="/a", date=date(2026, 3, 2), count=2),
+            PageView(path="/a", date=date(2026, 3, 3), count=3),
+            PageView(path="/b", date=date(2026, 3, 3), count=4),
+        ]
+    )
+    command = Command()
+    command.update_rollups()
+    PageView.objects.all().delete()
+
+    series = command.build_series(2026)
+
+    assert series[""]["day"] == [["2026-03-02", 2], ["2026-03-03", 7]]
+    assert series["/a"]["day"] == [["2026-03-02", 2], ["2026-03-03", 3]]
+    assert series["/b"]["week"] == [["2026-03-02", 4]]
+    assert series["/a"]["month"] == [["2026-03-01", 5]]
+
+
+def test_rollups_are_updated_from_the_last_rolled_up_day(db):
+    PageView.objects.create(path="/a", date=date(2026, 3, 2), count=1)
+    PageView.objects.create(path="/a", date=date(2026, 3, 3), count=1)
+    command = Command()
+    command.update_rollups()
+    # Views flushed late into days already rolled up, and a new day
+    PageView.objects.filter(path="/a").update(count=5)
+    PageView.objects.create(path="/a", date=date(2026, 3, 4), count=1)
+    command.update_rollups()
+
+    series = command.build_series(2026)
+
+    assert series["/a"]["day"] == [
+        ["2026-03-02", 5],
+        ["2026-03-03", 5],
+        ["2026-03-04", 1],
+    ]
+    assert series["/a"]["week"] == [["2026-03-02", 11]]
+    assert series["/a"]["month"] == [["2026-03-01", 11]]
+
+
+def test_rollup_levels_agree(db):
+    command = Command()
+    # Daily runs across the week of March 30th, which spans two months
+    for day in range(8):
+        today = date(2026, 3, 27) + timedelta(days=day)
+        # Views of the last two days flushed after their rollup
+        PageView.objects.filter(date__gte=today - timedelta(days=2)).update(
+            count=F("count") + 1
+        )
+        PageView.objects.create(path="/a", date=today, count=1)
+        command.update_rollups()
+
+    series = command.build_series(2026)
+
+    for path in ("", "/a"):
+        for period, start_of in (
+            ("week", lambda day: day - timedelta(days=day.weekday())),
+            ("month", lambda day: day.replace(day=1)),
+        ):
+            totals = defaultdict(int)
+            for day, count in series[path]["day"]:
+                totals[start_of(date.fromisoformat(day)).isoformat()] += count
+            assert series[path][period] == sorted(map(list, totals.items()))
@@ -0,0 +1,79 @@
+import base64
+from itertools import chain
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+
+from mousetube_api.models import File
+from mousetube_api.pagination import KeysetPagination
+
+URL = reverse("file-list") + "?pagination=cursor&page_size=2"
+
+
+@pytest.fixture
+def files(db):
+    names = [None, "b", "a", None, "b", "c", None]
+    created = [File.objects.create(name=name) for name in names]
+    # NULL names first, then by name and id
+    return sorted(created, key=lambda f: (f.name is not None, f.name or "", f.pk))
+
+
+def walk(client, url, link):
+    """
+    Follow the ``next`` or ``previous`` links from a URL.
+
+    Returns:
+        tuple: The ids of each page, and the body of the last page.
+    """
+    pages = []
+    while url:
+        body = client.get(url).json()
+        pages.append([row["id"] for row in body["results"]])
+        url = body[link]
+    return pages, body
+
+
+def test_forward_walk(client, files):
+    pages, _ = walk(client, URL, "next")
+    assert list(chain(*pages)) == [f.pk for f in files]
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+
+def test_backward_walk(client, files):
+    pages, last = walk(client, URL, "next")
+    backward, first = walk(client, last["previous"], "previous")
+    assert first["previous"] is None
+    assert list(chain(*reversed(backward), pages[-1])) == [f.pk for f in files]
+
+
+def test_count_is_only_computed_on_request(client, files):
+    assert client.get(URL).json()["count"] is None
+    assert client.get(URL + "&count=true").json()["count"] == len(files)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        base64.urlsafe_b64encode(b"[]").decode(),
+        base64.urlsafe_b64encode(b'{"n": 1, "i": 2}').decode(),
+        base64.urlsafe_b64encode(b'{"n": "a", "i": "2"}').decode(),
+    ],
+)
+def test_malformed_cursor(client, files, cursor):
+    response = client.get(f"{reverse('file-list')}?cursor={cursor}")
+    assert response.status_code == 404
+    assert response.json() == {"detail": KeysetPagination.invalid_cursor_message}
+
+
+def test_ordering_needs_no_null_term_on_mariadb(db, monkeypatch):
+    # MariaDB sorts NULLs first and has no NULLS FIRST/LAST modifier
+    monkeypatch.setattr(connection.features, "supports_order_by_nulls_modifier", False)
+    monkeypatch.setattr(connection.features, "order_by_nulls_first", True)
+    paginator = KeysetPagination()
+    paginator.name_nullable = True
+    for backwards in (False, True):
+        queryset = File.objects.order_by(*paginator.ordering(backwards))
+        sql = str(queryset.query).split("ORDER BY")[1]
+        assert "NULL" not in sql
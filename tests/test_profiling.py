@@ -0,0 +1,65 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from mousetube_api.caching import cache_url
+from mousetube_api.models import RequestProfile
+
+
+@pytest.fixture
+def token(db):
+    def make(is_staff):
+        user = get_user_model().objects.create_user(
+            f"user{is_staff}", password="x", is_staff=is_staff
+        )
+        return Token.objects.create(user=user).key
+
+    return make
+
+
+def test_staff_token_is_profiled(client, catalog, token):
+    catalog(1)
+    response = client.get(
+        reverse("user-list") + "?_profile",
+        HTTP_AUTHORIZATION=f"Token {token(True)}",
+    )
+    assert response.status_code == 200
+    assert "X-Profile" in response
+    assert "ETag" not in response
+    profile = RequestProfile.objects.get()
+    assert profile.user == "userTrue"
+    assert profile.query_count > 0
+
+
+@pytest.mark.parametrize("staff_token", [False, None])
+def test_other_requests_are_not_profiled(client, catalog, token, staff_token):
+    catalog(1)
+    key = "nope" if staff_token is None else token(staff_token)
+    response = client.get(
+        reverse("user-list") + "?_profile", HTTP_AUTHORIZATION=f"Token {key}"
+    )
+    assert "X-Profile" not in response
+    assert not RequestProfile.objects.exists()
+
+
+def test_profiled_requests_skip_the_cache(client, catalog, token):
+    catalog(1)
+    url = reverse("user-list")
+    client.get(url)
+    cache_size = len(cache._cache)
+    response = client.get(url + "?_profile", HTTP_AUTHORIZATION=f"Token {token(True)}")
+    assert "X-Profile" in response
+    assert len(cache._cache) == cache_size
+    # The cached response was not read: the profile saw the queries
+    assert RequestProfile.objects.get().query_count > 1
+
+
+def test_profile_flag_is_not_part_of_the_cache_key(rf):
+    request = Request(rf.get("/api/user/?page=2&_profile&fields=id"))
+    assert cache_url(request) == "http://testserver/api/user/?page=2&fields=id"
+    assert cache_url(Request(rf.get("/api/user/?_profile"))) == (
+        "http://testserver/api/user/"
+    )
@@ -0,0 +1,48 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mousetube_api.models import Dataset, File
+
+LIST_ENDPOINTS = [
+    "user-list",
+    "strain-list",
+    "subject-list",
+    "protocol-list",
+    "experiment-list",
+    "software-list",
+    "dataset-list",
+    "file-list",
+]
+
+
+def count_queries(client, url):
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize("url_name", LIST_ENDPOINTS)
+@pytest.mark.parametrize("params", ["", "?page_size=100"])
+def test_list_query_count_does_not_grow_with_rows(client, catalog, url_name, params):
+    url = reverse(url_name) + params
+    catalog(3)
+    small = count_queries(client, url)
+    catalog(30, offset=3)
+    assert count_queries(client, url) == small
+
+
+def test_dataset_files_query_count_does_not_grow_with_rows(client, catalog):
+    rows = catalog(3)
+    dataset = rows["datasets"][0]
+    url = reverse("dataset-files", args=[dataset.pk])
+    small = count_queries(client, url)
+    dataset.files.set(File.objects.all()[:3])
+    catalog(30, offset=3)
+    dataset.files.set(File.objects.all())
+    assert Dataset.objects.get(pk=dataset.pk).files.count() == 33
+    assert count_queries(client, url) == small
@@ -0,0 +1,66 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+
+from mousetube_api.models import Dataset, FileSearch
+from mousetube_api.search import Columns, Match, search_datasets
+
+
+@pytest.fixture
+def datasets(catalog):
+    rows = catalog(2)["datasets"]
+    rows[0].description = "Ultrasonic vocalizations of pups"
+    rows[0].save()
+    rows[1].metadata = {"lab": "Strasbourg"}
+    rows[1].save()
+    return rows
+
+
+def names(queryset):
+    return sorted(queryset.values_list("name", flat=True))
+
+
+def test_match_compiles_to_multi_column_fulltext_search(db):
+    queryset = Dataset.objects.all()
+    match = Match(Columns(F("name"), F("description")), "+pups*").resolve_expression(
+        queryset.query
+    )
+    compiler = queryset.query.get_compiler(connection=connection)
+    sql, params = match.as_mysql(compiler, connection)
+    assert sql.startswith("MATCH (")
+    assert '"name", ' in sql
+    assert sql.endswith("AGAINST (%s IN BOOLEAN MODE)")
+    assert params == ("+pups*",)
+
+
+def test_search_falls_back_to_substrings(datasets):
+    queryset = Dataset.objects.all()
+    assert names(search_datasets(queryset, "vocalization")) == ["dataset0"]
+    assert names(search_datasets(queryset, "strasbourg")) == ["dataset1"]
+    assert names(search_datasets(queryset, "musculus")) == ["dataset0", "dataset1"]
+
+
+def test_search_restricted_to_a_field(datasets):
+    queryset = Dataset.objects.all()
+    assert names(search_datasets(queryset, "pups", "name")) == []
+    assert names(search_datasets(queryset, "pups", "description")) == ["dataset0"]
+    assert names(search_datasets(queryset, "mus", "species")) == [
+        "dataset0",
+        "dataset1",
+    ]
+
+
+def test_rebuild_search_index_if_empty(catalog):
+    catalog(2)
+    FileSearch.objects.all().delete()
+    call_command("rebuild_search_index", if_empty=True, stdout=StringIO())
+    assert FileSearch.objects.count() == 2
+
+    FileSearch.objects.filter(pk=FileSearch.objects.first().pk).delete()
+    call_command("rebuild_search_index", if_empty=True, stdout=StringIO())
+    assert FileSearch.objects.count() == 1
+    call_command("rebuild_search_index", stdout=StringIO())
+    assert FileSearch.objects.count() == 2
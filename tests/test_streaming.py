@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+from mousetube_api.renderers import iterate_async
+
+STREAMED_ENDPOINTS = [
+    "user-list",
+    "strain-list",
+    "subject-list",
+    "protocol-list",
+    "experiment-list",
+]
+
+
+@pytest.mark.parametrize("url_name", STREAMED_ENDPOINTS)
+def test_stream_is_async_under_asgi(client, asgi_get, catalog, url_name):
+    catalog(3)
+    url = reverse(url_name)
+    response, body = asgi_get(url + "?stream=1")
+    assert response.status_code == 200
+    assert json.loads(body) == client.get(url).json()
+
+
+def test_stream_is_sync_under_wsgi(client, catalog):
+    catalog(3)
+    response = client.get(reverse("user-list") + "?stream=1")
+    assert not response.is_async
+    assert len(json.loads(b"".join(response.streaming_content))) == 3
+
+
+def test_iterate_async_is_lazy_and_closes_iterator():
+    produced = []
+    closed = []
+
+    def pieces():
+        try:
+            for i in range(3):
+                produced.append(i)
+                yield i
+        finally:
+            closed.append(True)
+
+    @async_to_sync
+    async def first_two():
+        seen = []
+        iterator = iterate_async(pieces())
+        async for piece in iterator:
+            seen.append(piece)
+            if len(seen) == 2:
+                break
+        await iterator.aclose()
+        return seen
+
+    assert first_two() == [0, 1]
+    assert produced == [0, 1]
+    assert closed == [True]